@@ -0,0 +1,236 @@
+package main
+
+// batch.go — manifest-driven bulk Unsplash downloads.
+//
+// A manifest is a list of searches, topics and collections, each with an
+// optional page range and per-entry cap. The whole manifest runs as one job:
+//
+//   entry fetchers ──► pageCh (fetch-ahead) ──► dispatcher ──► jobCh ──► worker pool
+//
+// Entry fetchers walk their pages through the shared UnsplashClient, so the
+// sliding-window rate limiter applies across the whole batch. Images from every
+// entry share one pool of `workers` goroutines instead of one pool per page.
+
+import (
+	"fmt"
+	"os"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+// ManifestEntry is one line of a batch manifest.
+type ManifestEntry struct {
+	Kind  string `json:"kind"` // search | topic | collection
+	Query string `json:"query,omitempty"`
+	Slug  string `json:"slug,omitempty"`
+	ColID string `json:"col_id,omitempty"`
+	From  int    `json:"from,omitempty"` // first page (default 1)
+	To    int    `json:"to,omitempty"`   // last page (0 = until cap or exhausted)
+	Max   int    `json:"max,omitempty"`  // max new images (0 = no cap)
+	Dest  string `json:"dest,omitempty"` // overrides the batch destination
+}
+
+// label is the human-readable name reported in progress events.
+func (e ManifestEntry) label() string {
+	switch strings.ToLower(e.Kind) {
+	case "search":
+		return "search '" + e.Query + "'"
+	case "topic":
+		return "topic " + e.Slug
+	case "collection":
+		return "collection " + e.ColID
+	}
+	return e.Kind
+}
+
+// fetchPage returns one page of photos for this entry.
+func (e ManifestEntry) fetchPage(cli *UnsplashClient, page int) ([]PhotoMeta, error) {
+	switch strings.ToLower(e.Kind) {
+	case "search":
+		return cli.Search(e.Query, page)
+	case "topic":
+		return cli.TopicPhotos(e.Slug, page)
+	case "collection":
+		return cli.CollectionPhotos(e.ColID, page)
+	}
+	return nil, fmt.Errorf("unknown manifest kind: %q", e.Kind)
+}
+
+// batchEntry is the runtime state of one manifest entry.
+type batchEntry struct {
+	spec      ManifestEntry
+	idx       int    // 1-based position in the manifest
+	dest      string // resolved destination directory
+	remaining int64  // new images still wanted (only used when spec.Max > 0)
+	pending   int64  // photos queued but not yet finished
+	fetched   int32  // 1 once the fetcher has stopped producing pages
+	stats     DownloadStats
+}
+
+func (b *batchEntry) capped() bool {
+	return b.spec.Max > 0 && atomic.LoadInt64(&b.remaining) <= 0
+}
+
+type batchPage struct {
+	entry  *batchEntry
+	photos []PhotoMeta
+}
+
+type batchJob struct {
+	entry *batchEntry
+	photo PhotoMeta
+}
+
+// RunBatch downloads every entry in the manifest and reports progress per entry.
+// emitFn must be safe for concurrent use.
+func RunBatch(manifest []ManifestEntry, destDir string, workers int,
+	cli *UnsplashClient, db *HashDB, job *Job, emitFn func(Event)) DownloadStats {
+
+	const (
+		entryConcurrency = 4 // entries fetching pages at the same time
+		pagesAhead       = 4 // pages buffered ahead of the worker pool
+	)
+	if workers <= 0 {
+		workers = 8
+	}
+	start := time.Now()
+
+	entries := make([]*batchEntry, 0, len(manifest))
+	for i, m := range manifest {
+		dest := destDir
+		if m.Dest != "" {
+			dest = m.Dest
+		}
+		if m.From <= 0 {
+			m.From = 1
+		}
+		// A bare entry with neither a cap nor an end page means "one page".
+		if m.To == 0 && m.Max == 0 {
+			m.To = m.From
+		}
+		entries = append(entries, &batchEntry{
+			spec: m, idx: i + 1, dest: dest, remaining: int64(m.Max),
+		})
+	}
+
+	var total DownloadStats
+	var emitMu sync.Mutex
+	report := func(b *batchEntry, msg string) {
+		emitMu.Lock()
+		defer emitMu.Unlock()
+		elapsed := time.Since(start).Seconds()
+		speed := 0.0
+		if elapsed > 0 {
+			speed = float64(atomic.LoadInt64(&total.New)) / elapsed
+		}
+		emitFn(Event{
+			Event:   "progress",
+			Entry:   b.idx,
+			Label:   b.spec.label(),
+			New:     atomic.LoadInt64(&b.stats.New),
+			Dupes:   atomic.LoadInt64(&b.stats.Dupes),
+			Errors:  atomic.LoadInt64(&b.stats.Errors),
+			Speed:   speed,
+			Elapsed: elapsed,
+			Msg:     msg,
+		})
+	}
+	// finish reports an entry as complete once its fetcher has stopped and
+	// every queued photo has been processed. pending is raised before a page
+	// is queued, so whichever side observes both conditions last reports it.
+	var finishOnce sync.Map
+	finish := func(b *batchEntry) {
+		if atomic.LoadInt32(&b.fetched) == 0 || atomic.LoadInt64(&b.pending) > 0 {
+			return
+		}
+		if _, dup := finishOnce.LoadOrStore(b.idx, true); !dup {
+			report(b, "entry_done")
+		}
+	}
+
+	// ── Stage 1: page fetchers ────────────────────────────────────────────────
+	pageCh := make(chan batchPage, pagesAhead)
+	var fetchWg sync.WaitGroup
+	fetchSem := make(chan struct{}, entryConcurrency)
+	for _, b := range entries {
+		if err := os.MkdirAll(b.dest, 0755); err != nil {
+			atomic.AddInt64(&b.stats.Errors, 1)
+			atomic.AddInt64(&total.Errors, 1)
+			atomic.StoreInt32(&b.fetched, 1)
+			finish(b)
+			continue
+		}
+		fetchWg.Add(1)
+		go func(b *batchEntry) {
+			defer fetchWg.Done()
+			defer finish(b)
+			defer atomic.StoreInt32(&b.fetched, 1)
+			fetchSem <- struct{}{}
+			defer func() { <-fetchSem }()
+			report(b, "fetching")
+			for page := b.spec.From; b.spec.To == 0 || page <= b.spec.To; page++ {
+				if b.capped() {
+					break
+				}
+				photos, err := b.spec.fetchPage(cli, page)
+				if err != nil {
+					atomic.AddInt64(&b.stats.Errors, 1)
+					atomic.AddInt64(&total.Errors, 1)
+					break
+				}
+				if len(photos) == 0 {
+					break
+				}
+				atomic.AddInt64(&b.pending, int64(len(photos)))
+				pageCh <- batchPage{entry: b, photos: photos}
+			}
+		}(b)
+	}
+	go func() {
+		fetchWg.Wait()
+		close(pageCh)
+	}()
+
+	// ── Stage 2: worker pool shared by every entry ────────────────────────────
+	jobCh := make(chan batchJob, workers)
+	var workWg sync.WaitGroup
+	for w := 0; w < workers; w++ {
+		workWg.Add(1)
+		go func() {
+			defer workWg.Done()
+			for j := range jobCh {
+				b := j.entry
+				if !b.capped() {
+					switch fetchPhoto(j.photo, b.dest, db, job) {
+					case photoNew:
+						atomic.AddInt64(&b.stats.New, 1)
+						atomic.AddInt64(&total.New, 1)
+						atomic.AddInt64(&b.remaining, -1)
+					case photoDupe:
+						atomic.AddInt64(&b.stats.Dupes, 1)
+						atomic.AddInt64(&total.Dupes, 1)
+					default:
+						atomic.AddInt64(&b.stats.Errors, 1)
+						atomic.AddInt64(&total.Errors, 1)
+					}
+					report(b, "")
+				}
+				atomic.AddInt64(&b.pending, -1)
+				finish(b)
+			}
+		}()
+	}
+
+	// Dispatcher: flatten pages into per-photo jobs, interleaving entries in
+	// the order their pages arrive.
+	for pg := range pageCh {
+		for _, p := range pg.photos {
+			jobCh <- batchJob{entry: pg.entry, photo: p}
+		}
+	}
+	close(jobCh)
+	workWg.Wait()
+	return total
+}
@@ -3,12 +3,14 @@ package main
 import (
 	"encoding/json"
 	"fmt"
+	"hash/crc32"
 	"io"
 	"math/rand"
 	"net/http"
 	"os"
 	"os/exec"
 	"path/filepath"
+	"sort"
 	"strings"
 	"sync"
 	"sync/atomic"
@@ -56,7 +58,14 @@ type progressFn func(new, dupe, errInc int)
 type ResolvedRepo struct {
 	Spec   RepoSpec
 	Branch string
-	Paths  []string // image paths from tree API — populated during resolve
+	Images []treeImage // eligible images from tree API — populated during resolve
+}
+
+// treeImage is one image blob from the tree API, scored by fitBlob.
+type treeImage struct {
+	Path  string
+	Size  int64
+	Score float64
 }
 
 // ── HTTP helpers ──────────────────────────────────────────────────────────────
@@ -107,7 +116,7 @@ func retryAfterSecs(h http.Header) int {
 }
 
 // getBytes fetches a URL with retry+backoff. Used for API calls and small files.
-func getBytes(url string, maxAttempts int) ([]byte, int, error) {
+func getBytes(url string, maxAttempts int, job *Job) ([]byte, int, error) {
 	var lastErr error
 	for attempt := 0; attempt < maxAttempts; attempt++ {
 		if attempt > 0 {
@@ -115,6 +124,9 @@ func getBytes(url string, maxAttempts int) ([]byte, int, error) {
 			jitter := time.Duration(rand.Int63n(int64(base)/2 + 1))
 			time.Sleep(base + jitter)
 		}
+		if err := job.err(); err != nil {
+			return nil, 0, err
+		}
 		resp, err := doGET(url)
 		if err != nil {
 			lastErr = err
@@ -123,7 +135,7 @@ func getBytes(url string, maxAttempts int) ([]byte, int, error) {
 		code := resp.StatusCode
 		switch {
 		case code == 200:
-			data, err := io.ReadAll(resp.Body)
+			data, err := io.ReadAll(job.wrap(resp.Body))
 			resp.Body.Close()
 			if err != nil {
 				lastErr = err
@@ -207,19 +219,22 @@ type treeResponse struct {
 	Tree []struct {
 		Path string `json:"path"`
 		Type string `json:"type"`
+		Size int64  `json:"size"`
 	} `json:"tree"`
 	Truncated bool `json:"truncated"`
 }
 
-// listRepoImages fetches the repo tree and returns all image paths.
+// listRepoImages fetches the repo tree and returns its images scored by
+// fitBlob (see rank.go), in tree order. strict (capped downloads, scan)
+// keeps only the images eligible for res.
 // Returns nil if the tree is truncated (>100k files) or the API fails —
 // caller should fall back to zip download in that case.
-func listRepoImages(owner, repo, branch, subdir string) []string {
+func listRepoImages(owner, repo, branch, subdir string, res Resolution, strict bool) []treeImage {
 	url := fmt.Sprintf(
 		"https://api.github.com/repos/%s/%s/git/trees/%s?recursive=1",
 		owner, repo, branch,
 	)
-	data, code, err := getBytes(url, 3)
+	data, code, err := getBytes(url, 3, nil)
 	if err != nil || code != 200 {
 		return nil
 	}
@@ -238,7 +253,8 @@ func listRepoImages(owner, repo, branch, subdir string) []string {
 		prefix = strings.ToLower(subdir) + "/"
 	}
 
-	var paths []string
+	// Non-nil even when empty: nothing eligible is not a reason to fetch the zip.
+	imgs := []treeImage{}
 	for _, entry := range tree.Tree {
 		if entry.Type != "blob" {
 			continue
@@ -250,14 +266,17 @@ func listRepoImages(owner, repo, branch, subdir string) []string {
 		if prefix != "" && !strings.HasPrefix(lower, prefix) {
 			continue
 		}
-		paths = append(paths, entry.Path)
+		if s, ok := res.fitBlob(entry.Path, entry.Size); ok || !strict {
+			imgs = append(imgs, treeImage{Path: entry.Path, Size: entry.Size, Score: s})
+		}
 	}
-	return paths
+	return imgs
 }
 
-// CountRepoImages uses the tree API to count images (used by scan command).
-func CountRepoImages(owner, repo, branch, subdir string) int {
-	return len(listRepoImages(owner, repo, branch, subdir))
+// CountRepoImages uses the tree API to count eligible images (used by scan
+// command, whose total is the ceiling for a capped download).
+func CountRepoImages(owner, repo, branch, subdir string, res Resolution) int {
+	return len(listRepoImages(owner, repo, branch, subdir, res, true))
 }
 
 // ── Resolve + count (for scan) ────────────────────────────────────────────────
@@ -279,7 +298,7 @@ func ResolveAllBranches(specs []RepoSpec) []ResolvedRepo {
 	return results
 }
 
-func CountAllRepos(specs []RepoSpec) int {
+func CountAllRepos(specs []RepoSpec, res Resolution) int {
 	resolved := ResolveAllBranches(specs)
 	var total int64
 	// Cap tree API concurrency at 8 — well within 60 req/hr for 19 repos.
@@ -294,7 +313,7 @@ func CountAllRepos(specs []RepoSpec) int {
 		go func(rr ResolvedRepo) {
 			defer wg.Done()
 			defer func() { <-sem }()
-			n := CountRepoImages(rr.Spec.Owner, rr.Spec.Repo, rr.Branch, rr.Spec.Subdir)
+			n := CountRepoImages(rr.Spec.Owner, rr.Spec.Repo, rr.Branch, rr.Spec.Subdir, res)
 			atomic.AddInt64(&total, int64(n))
 		}(r)
 	}
@@ -317,10 +336,13 @@ func CountAllRepos(specs []RepoSpec) int {
 //   - Zero temp disk usage (no archive file)
 //   - Zero extraction CPU overhead
 //   - Progress updates start from the very first file
+//
+// With a cap the pipeline waits for every tree instead, so the best-ranked
+// images across all repos are fetched first (downloadRanked).
 
-func ResolveAndDownload(specs []RepoSpec, wdir string,
+func ResolveAndDownload(specs []RepoSpec, wdir string, res Resolution,
 	imgWorkers, repoConcurrency int,
-	db *HashDB, prog progressFn, capRemaining *int64) {
+	db *HashDB, prog progressFn, capRemaining *int64, job *Job) {
 
 	if repoConcurrency <= 0 {
 		repoConcurrency = 16
@@ -342,8 +364,8 @@ func ResolveAndDownload(specs []RepoSpec, wdir string,
 				return
 			}
 			// Fetch tree immediately after branch resolves.
-			paths := listRepoImages(s.Owner, s.Repo, branch, s.Subdir)
-			resolvedCh <- ResolvedRepo{Spec: s, Branch: branch, Paths: paths}
+			imgs := listRepoImages(s.Owner, s.Repo, branch, s.Subdir, res, capRemaining != nil)
+			resolvedCh <- ResolvedRepo{Spec: s, Branch: branch, Images: imgs}
 		}(spec)
 	}
 	go func() {
@@ -351,6 +373,17 @@ func ResolveAndDownload(specs []RepoSpec, wdir string,
 		close(resolvedCh)
 	}()
 
+	if capRemaining != nil {
+		var resolved []ResolvedRepo
+		for rr := range resolvedCh {
+			if rr.Branch != "" {
+				resolved = append(resolved, rr)
+			}
+		}
+		downloadRanked(resolved, wdir, imgWorkers, repoConcurrency, db, prog, capRemaining, job)
+		return
+	}
+
 	// repoConcurrency repos download simultaneously.
 	sem := make(chan struct{}, repoConcurrency)
 	var dlWg sync.WaitGroup
@@ -359,30 +392,92 @@ func ResolveAndDownload(specs []RepoSpec, wdir string,
 		if rr.Branch == "" {
 			continue
 		}
-		if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
-			break
-		}
 		sem <- struct{}{}
 		dlWg.Add(1)
 		go func(r ResolvedRepo) {
 			defer dlWg.Done()
 			defer func() { <-sem }()
-			if r.Paths != nil {
+			dir := db.viewDir(wdir, r.Spec.Slug)
+			if r.Images != nil {
 				// Fast path: direct raw file downloads
-				downloadRawFiles(r, wdir, imgWorkers, db, prog, capRemaining)
+				downloadRawFiles(r, dir, imgWorkers, db, prog, nil, job)
 			} else {
 				// Fallback: zip download (truncated tree or API failure)
-				downloadZip(r.Spec, r.Branch, wdir, imgWorkers, db, prog, capRemaining)
+				downloadZip(r.Spec, r.Branch, dir, imgWorkers, db, prog, nil, job)
 			}
 		}(rr)
 	}
 	dlWg.Wait()
 }
 
+// downloadRanked fills the cap from every listed repo at once, best-ranked
+// image first. Repos without a tree (zip fallback) can't be ranked; they
+// only run if the ranked images didn't fill the cap.
+func downloadRanked(resolved []ResolvedRepo, wdir string,
+	imgWorkers, repoConcurrency int,
+	db *HashDB, prog progressFn, capRemaining *int64, job *Job) {
+
+	type item struct {
+		rr  int
+		img treeImage
+	}
+	var items []item
+	for i, rr := range resolved {
+		for _, img := range rr.Images {
+			items = append(items, item{i, img})
+		}
+	}
+	sort.SliceStable(items, func(a, b int) bool {
+		x, y := items[a].img, items[b].img
+		if x.Score != y.Score {
+			return x.Score > y.Score
+		}
+		return x.Size < y.Size
+	})
+
+	var stats DownloadStats
+	sem := make(chan struct{}, imgWorkers)
+	var wg sync.WaitGroup
+	for _, it := range items {
+		if atomic.LoadInt64(capRemaining) <= 0 {
+			break
+		}
+		sem <- struct{}{}
+		wg.Add(1)
+		go func(it item) {
+			defer wg.Done()
+			defer func() { <-sem }()
+			if atomic.LoadInt64(capRemaining) <= 0 {
+				return
+			}
+			rr := resolved[it.rr]
+			tally(fetchRaw(rr, it.img.Path, db.viewDir(wdir, rr.Spec.Slug), db, job),
+				&stats, prog, capRemaining)
+		}(it)
+	}
+	wg.Wait()
+
+	rsem := make(chan struct{}, repoConcurrency)
+	var zwg sync.WaitGroup
+	for _, rr := range resolved {
+		if rr.Images != nil || atomic.LoadInt64(capRemaining) <= 0 {
+			continue
+		}
+		rsem <- struct{}{}
+		zwg.Add(1)
+		go func(r ResolvedRepo) {
+			defer zwg.Done()
+			defer func() { <-rsem }()
+			downloadZip(r.Spec, r.Branch, db.viewDir(wdir, r.Spec.Slug), imgWorkers, db, prog, capRemaining, job)
+		}(rr)
+	}
+	zwg.Wait()
+}
+
 // DownloadAllRepos kept for compatibility — delegates to ResolveAndDownload.
-func DownloadAllRepos(resolved []ResolvedRepo, wdir string,
+func DownloadAllRepos(resolved []ResolvedRepo, wdir string, res Resolution,
 	imgWorkers, repoConcurrency int,
-	db *HashDB, prog progressFn, capRemaining *int64) {
+	db *HashDB, prog progressFn, capRemaining *int64, job *Job) {
 
 	if repoConcurrency <= 0 {
 		repoConcurrency = 16
@@ -401,26 +496,65 @@ func DownloadAllRepos(resolved []ResolvedRepo, wdir string,
 		go func(rr ResolvedRepo) {
 			defer wg.Done()
 			defer func() { <-sem }()
-			DownloadRepoBranch(rr.Spec, rr.Branch, wdir, imgWorkers, db, prog, capRemaining)
+			DownloadRepoBranch(rr.Spec, rr.Branch, db.viewDir(wdir, rr.Spec.Slug), res, imgWorkers, db, prog, capRemaining, job)
 		}(r)
 	}
 	wg.Wait()
 }
 
-// downloadRawFiles downloads all images in rr.Paths directly from
-// raw.githubusercontent.com using imgWorkers concurrent goroutines.
+// fetchRaw downloads one repo file from raw.githubusercontent.com into wdir,
+// skipping it if its MD5 is already in db.
+func fetchRaw(rr ResolvedRepo, p, wdir string, db *HashDB, job *Job) photoResult {
+	rawURL := fmt.Sprintf(
+		"https://raw.githubusercontent.com/%s/%s/%s/%s",
+		rr.Spec.Owner, rr.Spec.Repo, rr.Branch, p,
+	)
+
+	// Download with retry — raw CDN is very reliable, 2 attempts enough.
+	data, _, err := getBytes(rawURL, 2, job)
+	if err != nil {
+		return photoErr
+	}
+
+	digest := md5hex(data)
+	if db.has(digest) {
+		return photoDupe
+	}
+
+	fname := filepath.Base(p)
+	if err := os.MkdirAll(wdir, 0755); err != nil {
+		return photoErr
+	}
+	outPath := db.savePath(wdir, fname, digest)
+	if err := os.WriteFile(outPath, data, 0644); err != nil {
+		return photoErr
+	}
+	db.link(wdir, fname, digest, outPath)
+
+	db.add(digest, outPath)
+	db.addCRC(crc32.ChecksumIEEE(data), uint64(len(data)), digest)
+	db.addSource(digest, rawURL)
+	return photoNew
+}
+
+// downloadRawFiles downloads all images in rr.Images directly from
+// raw.githubusercontent.com using imgWorkers concurrent goroutines,
+// best-ranked first when capped.
 func downloadRawFiles(rr ResolvedRepo, wdir string, workers int,
-	db *HashDB, prog progressFn, capRemaining *int64) DownloadStats {
+	db *HashDB, prog progressFn, capRemaining *int64, job *Job) DownloadStats {
 
 	if err := os.MkdirAll(wdir, 0755); err != nil {
 		return DownloadStats{Errors: 1}
 	}
+	if capRemaining != nil {
+		rankImages(rr.Images)
+	}
 
 	var stats DownloadStats
 	sem := make(chan struct{}, workers)
 	var wg sync.WaitGroup
 
-	for _, path := range rr.Paths {
+	for _, img := range rr.Images {
 		if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
 			break
 		}
@@ -433,50 +567,8 @@ func downloadRawFiles(rr ResolvedRepo, wdir string, workers int,
 			if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
 				return
 			}
-
-			rawURL := fmt.Sprintf(
-				"https://raw.githubusercontent.com/%s/%s/%s/%s",
-				rr.Spec.Owner, rr.Spec.Repo, rr.Branch, p,
-			)
-
-			// Download with retry — raw CDN is very reliable, 2 attempts enough.
-			data, _, err := getBytes(rawURL, 2)
-			if err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-
-			digest := md5hex(data)
-			if db.has(digest) {
-				atomic.AddInt64(&stats.Dupes, 1)
-				if prog != nil {
-					prog(0, 1, 0)
-				}
-				return
-			}
-
-			fname := filepath.Base(p)
-			outPath := flatSavePath(wdir, fname, digest)
-			if err := os.WriteFile(outPath, data, 0644); err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-
-			db.add(digest, outPath)
-			atomic.AddInt64(&stats.New, 1)
-			if capRemaining != nil {
-				atomic.AddInt64(capRemaining, -1)
-			}
-			if prog != nil {
-				prog(1, 0, 0)
-			}
-		}(path)
+			tally(fetchRaw(rr, p, wdir, db, job), &stats, prog, capRemaining)
+		}(img.Path)
 	}
 	wg.Wait()
 	return stats
@@ -484,56 +576,82 @@ func downloadRawFiles(rr ResolvedRepo, wdir string, workers int,
 
 // ── Zip fallback (truncated trees / API unavailable) ─────────────────────────
 
-func DownloadRepo(spec RepoSpec, wdir string, workers int,
-	db *HashDB, prog progressFn) DownloadStats {
+func DownloadRepo(spec RepoSpec, wdir string, res Resolution, workers int,
+	db *HashDB, prog progressFn, job *Job) DownloadStats {
 	branch := resolveBranch(spec.Owner, spec.Repo, spec.BranchHint)
 	if branch == "" {
 		return DownloadStats{Errors: 1}
 	}
-	return DownloadRepoBranch(spec, branch, wdir, workers, db, prog, nil)
+	return DownloadRepoBranch(spec, branch, wdir, res, workers, db, prog, nil, job)
 }
 
-func DownloadRepoBranch(spec RepoSpec, branch, wdir string,
+func DownloadRepoBranch(spec RepoSpec, branch, wdir string, res Resolution,
 	workers int, db *HashDB, prog progressFn,
-	capRemaining *int64) DownloadStats {
+	capRemaining *int64, job *Job) DownloadStats {
 
 	// Try fast direct-download path first.
-	paths := listRepoImages(spec.Owner, spec.Repo, branch, spec.Subdir)
-	if paths != nil {
-		rr := ResolvedRepo{Spec: spec, Branch: branch, Paths: paths}
-		return downloadRawFiles(rr, wdir, workers, db, prog, capRemaining)
+	imgs := listRepoImages(spec.Owner, spec.Repo, branch, spec.Subdir, res, capRemaining != nil)
+	if imgs != nil {
+		rr := ResolvedRepo{Spec: spec, Branch: branch, Images: imgs}
+		return downloadRawFiles(rr, wdir, workers, db, prog, capRemaining, job)
 	}
 	// Fall back to zip if tree API failed or tree was truncated.
-	return downloadZip(spec, branch, wdir, workers, db, prog, capRemaining)
+	return downloadZip(spec, branch, wdir, workers, db, prog, capRemaining, job)
 }
 
-// downloadZip downloads the repo archive to a temp file and extracts images.
+// downloadZip fetches the repo archive and extracts images from it.
 // Used only as fallback when the tree API is unavailable or the tree is truncated.
+//
+// Entries are processed straight off the HTTP stream (streamZip). If the
+// archive can't be read sequentially the remainder is handled the old way —
+// temp file + central directory — where everything already saved is skipped
+// by its CRC-32 without being decompressed again.
 func downloadZip(spec RepoSpec, branch, wdir string,
 	workers int, db *HashDB, prog progressFn,
-	capRemaining *int64) DownloadStats {
+	capRemaining *int64, job *Job) DownloadStats {
 
 	if err := os.MkdirAll(wdir, 0755); err != nil {
 		return DownloadStats{Errors: 1}
 	}
+	db.indexSizes()
+	if job.err() != nil {
+		return DownloadStats{}
+	}
 
 	archiveURL := fmt.Sprintf(
 		"https://github.com/%s/%s/archive/%s.zip",
 		spec.Owner, spec.Repo, branch,
 	)
 
-	tmpPath, err := fetchToTempFile(archiveURL, 4)
+	body, err := openStream(archiveURL, 4)
 	if err != nil {
 		return cloneFallback(spec, branch, wdir, db, prog, capRemaining)
 	}
+	stats, err := streamZip(job.wrap(body), spec.Repo, branch, spec.Subdir,
+		wdir, workers, db, prog, capRemaining)
+	body.Close()
+	if err == nil {
+		return stats
+	}
+
+	tmpPath, err := fetchToTempFile(archiveURL, 4, job)
+	if err != nil {
+		stats.Errors++
+		return stats
+	}
 	defer os.Remove(tmpPath)
 
-	return extractZipFile(tmpPath, spec.Repo, branch, spec.Subdir,
+	rest := extractZipFile(tmpPath, spec.Repo, branch, spec.Subdir,
 		wdir, workers, db, prog, capRemaining)
+	stats.New += rest.New
+	stats.Dupes += rest.Dupes
+	stats.Errors += rest.Errors
+	return stats
 }
 
-// fetchToTempFile streams a URL body to a temp file. Caller removes it.
-func fetchToTempFile(url string, maxAttempts int) (string, error) {
+// openStream GETs a URL with retry+backoff and returns the 200 body.
+// Caller closes it.
+func openStream(url string, maxAttempts int) (io.ReadCloser, error) {
 	var lastErr error
 	for attempt := 0; attempt < maxAttempts; attempt++ {
 		if attempt > 0 {
@@ -561,15 +679,31 @@ func fetchToTempFile(url string, maxAttempts int) (string, error) {
 		}
 		if resp.StatusCode != 200 {
 			resp.Body.Close()
-			return "", fmt.Errorf("HTTP %d", resp.StatusCode)
+			return nil, fmt.Errorf("HTTP %d", resp.StatusCode)
+		}
+		return resp.Body, nil
+	}
+	return nil, fmt.Errorf("after %d attempts: %w", maxAttempts, lastErr)
+}
+
+// fetchToTempFile streams a URL body to a temp file. Caller removes it.
+func fetchToTempFile(url string, maxAttempts int, job *Job) (string, error) {
+	var lastErr error
+	for attempt := 0; attempt < maxAttempts; attempt++ {
+		if err := job.err(); err != nil {
+			return "", err
+		}
+		body, err := openStream(url, maxAttempts-attempt)
+		if err != nil {
+			return "", err
 		}
 		f, err := os.CreateTemp("", "wallpimp-*.zip")
 		if err != nil {
-			resp.Body.Close()
+			body.Close()
 			return "", err
 		}
-		_, err = io.Copy(f, resp.Body)
-		resp.Body.Close()
+		_, err = io.Copy(f, job.wrap(body))
+		body.Close()
 		f.Close()
 		if err != nil {
 			os.Remove(f.Name())
@@ -632,8 +766,8 @@ func cloneFallback(spec RepoSpec, branch, destDir string,
 		if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
 			return filepath.SkipAll
 		}
+		rel, _ := filepath.Rel(cloneDir, path)
 		if spec.Subdir != "" {
-			rel, _ := filepath.Rel(cloneDir, path)
 			if !strings.HasPrefix(strings.ToLower(rel),
 				strings.ToLower(spec.Subdir)+string(os.PathSeparator)) {
 				return nil
@@ -652,12 +786,16 @@ func cloneFallback(spec RepoSpec, branch, destDir string,
 			}
 			return nil
 		}
-		dest := flatSavePath(destDir, filepath.Base(path), digest)
+		dest := db.savePath(destDir, filepath.Base(path), digest)
 		if err := os.WriteFile(dest, imgData, 0644); err != nil {
 			stats.Errors++
 			return nil
 		}
+		db.link(destDir, filepath.Base(path), digest, dest)
 		db.add(digest, dest)
+		db.addCRC(crc32.ChecksumIEEE(imgData), uint64(len(imgData)), digest)
+		db.addSource(digest, fmt.Sprintf("https://raw.githubusercontent.com/%s/%s/%s/%s",
+			spec.Owner, spec.Repo, branch, filepath.ToSlash(rel)))
 		stats.New++
 		if capRemaining != nil {
 			atomic.AddInt64(capRemaining, -1)
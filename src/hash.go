@@ -4,26 +4,152 @@ import (
 	"crypto/md5"
 	"encoding/hex"
 	"encoding/json"
+	"fmt"
+	"hash/crc32"
+	"io"
 	"os"
+	"strings"
 	"sync"
+	"time"
 )
 
 type HashDB struct {
 	mu   sync.RWMutex
 	data map[string]string // md5hex → filepath
+	crc  map[string]string // "crc32:size" → md5hex (see crcKey)
+	src  map[string]string // md5hex → URL the file was fetched from
 	path string
+	mod  time.Time // mtime of hashes.json when last loaded or saved
+
+	root  string // library root; relative entries resolve against it
+	store bool   // sharded layout (see store.go)
+
+	// Owned files with no CRC entry yet (saved before the index existed, or
+	// by the Python side), by size. hasCRC CRCs them only when a zip entry of
+	// the same size comes along. Built by indexSizes, once per session.
+	sizeOnce sync.Once
+	bySize   map[uint64][]string
+
+	// Changes made here since the last save. The Python side (importer,
+	// transcoder, cleanup, stream eviction) rewrites hashes.json while jobs
+	// run, so saves merge these onto the file instead of overwriting it.
+	dirty   map[string]bool // digests added or re-pointed
+	dropped map[string]bool // digests forgotten or cleaned up (tombstones)
+}
+
+// crcPath is the sidecar holding the CRC index: hashes.json → hashes.crc.json.
+func crcPath(path string) string {
+	return strings.TrimSuffix(path, ".json") + ".crc.json"
+}
+
+// crcKey indexes a file by the (CRC-32, uncompressed size) pair that zip
+// archives record for every entry, so known entries can be skipped without
+// decompressing them.
+func crcKey(crc uint32, size uint64) string {
+	return fmt.Sprintf("%08x:%d", crc, size)
+}
+
+// srcPath is the sidecar recording where each file came from, so the Python
+// transcoder can note a re-fetch URL before replacing the original.
+func srcPath(path string) string {
+	return strings.TrimSuffix(path, ".json") + ".src.json"
 }
 
 func loadHashDB(path string) *HashDB {
-	db := &HashDB{path: path, data: make(map[string]string)}
+	db := &HashDB{path: path, data: make(map[string]string),
+		crc: make(map[string]string), src: make(map[string]string),
+		dirty: make(map[string]bool), dropped: make(map[string]bool)}
 	raw, err := os.ReadFile(path)
 	if err != nil {
 		return db
 	}
 	_ = json.Unmarshal(raw, &db.data)
+	if st, err := os.Stat(path); err == nil {
+		db.mod = st.ModTime()
+	}
+	if raw, err := os.ReadFile(crcPath(path)); err == nil {
+		_ = json.Unmarshal(raw, &db.crc)
+	}
+	if raw, err := os.ReadFile(srcPath(path)); err == nil {
+		_ = json.Unmarshal(raw, &db.src)
+	}
 	return db
 }
 
+// refresh merges hashes.json back in if something else (the Python side's
+// transcoder or importer) rewrote it since we last loaded or saved.
+func (db *HashDB) refresh() {
+	st, err := os.Stat(db.path)
+	if err != nil {
+		return
+	}
+	db.mu.Lock()
+	defer db.mu.Unlock()
+	if st.ModTime().Equal(db.mod) {
+		return
+	}
+	db.mergeDisk()
+	db.mod = st.ModTime()
+}
+
+// mergeDisk rebuilds the maps from the files on disk plus this session's
+// unsaved changes. Entries added or dropped here since the last save win;
+// everything else is taken from disk as is — including paths the transcoder
+// re-pointed and entries the Python side deleted, which stay deleted.
+// Callers hold mu.
+func (db *HashDB) mergeDisk() {
+	raw, err := os.ReadFile(db.path)
+	if err != nil {
+		return // nothing saved yet
+	}
+	var disk map[string]string
+	if json.Unmarshal(raw, &disk) != nil {
+		return
+	}
+	if disk == nil {
+		disk = make(map[string]string)
+	}
+	for h := range db.dirty {
+		if p, ok := db.data[h]; ok {
+			disk[h] = p
+		}
+	}
+	for h := range db.dropped {
+		delete(disk, h)
+	}
+	db.data = disk
+
+	// Sidecars only ever grow on the other side; keep what either has for a
+	// digest that is still owned.
+	db.crc = mergeSidecar(crcPath(db.path), db.crc)
+	for k, h := range db.crc {
+		if _, ok := db.data[h]; !ok {
+			delete(db.crc, k)
+		}
+	}
+	db.src = mergeSidecar(srcPath(db.path), db.src)
+	for h := range db.src {
+		if _, ok := db.data[h]; !ok {
+			delete(db.src, h)
+		}
+	}
+}
+
+// mergeSidecar returns the sidecar at path overlaid with mem.
+func mergeSidecar(path string, mem map[string]string) map[string]string {
+	var disk map[string]string
+	if raw, err := os.ReadFile(path); err == nil {
+		_ = json.Unmarshal(raw, &disk)
+	}
+	if disk == nil {
+		return mem
+	}
+	for k, v := range mem {
+		disk[k] = v
+	}
+	return disk
+}
+
 func (db *HashDB) has(digest string) bool {
 	db.mu.RLock()
 	defer db.mu.RUnlock()
@@ -33,18 +159,161 @@ func (db *HashDB) has(digest string) bool {
 
 func (db *HashDB) add(digest, fpath string) {
 	db.mu.Lock()
-	db.data[digest] = fpath
+	db.data[digest] = db.rel(fpath)
+	db.dirty[digest] = true
+	delete(db.dropped, digest)
 	db.mu.Unlock()
 }
 
-func (db *HashDB) save() error {
+// hasCRC reports whether a file with this CRC-32 and size is already owned.
+// Entries whose digest has since been dropped from the main map don't count.
+// On a miss, owned files of this size that aren't indexed yet are CRC'd (each
+// at most once) and the index consulted again.
+func (db *HashDB) hasCRC(crc uint32, size uint64) bool {
+	if db.knownCRC(crc, size) {
+		return true
+	}
+	db.mu.Lock()
+	digests := db.bySize[size]
+	delete(db.bySize, size)
+	paths := make([]string, len(digests))
+	for i, h := range digests {
+		paths[i] = db.abs(db.data[h])
+	}
+	db.mu.Unlock()
+	if len(digests) == 0 {
+		return false
+	}
+	for i, p := range paths {
+		f, err := os.Open(p)
+		if err != nil {
+			continue
+		}
+		c := crc32.NewIEEE()
+		n, err := io.Copy(c, f)
+		f.Close()
+		if err == nil {
+			db.addCRC(c.Sum32(), uint64(n), digests[i])
+		}
+	}
+	return db.knownCRC(crc, size)
+}
+
+func (db *HashDB) knownCRC(crc uint32, size uint64) bool {
 	db.mu.RLock()
 	defer db.mu.RUnlock()
+	digest, ok := db.crc[crcKey(crc, size)]
+	if !ok {
+		return false
+	}
+	_, ok = db.data[digest]
+	return ok
+}
+
+func (db *HashDB) addCRC(crc uint32, size uint64, digest string) {
+	db.mu.Lock()
+	db.crc[crcKey(crc, size)] = digest
+	db.mu.Unlock()
+}
+
+// indexSizes groups owned files that have no CRC entry by size, so hasCRC
+// can CRC just the ones a zip entry could match. Costs one stat per such
+// file, the first time a session falls back to a zip; no file is read here.
+func (db *HashDB) indexSizes() {
+	db.sizeOnce.Do(func() {
+		db.mu.RLock()
+		indexed := make(map[string]bool, len(db.crc))
+		for _, h := range db.crc {
+			indexed[h] = true
+		}
+		todo := make(map[string]string)
+		for h, p := range db.data {
+			if !indexed[h] {
+				todo[h] = db.abs(p)
+			}
+		}
+		db.mu.RUnlock()
+
+		bySize := make(map[uint64][]string)
+		for h, p := range todo {
+			if st, err := os.Stat(p); err == nil && st.Mode().IsRegular() {
+				bySize[uint64(st.Size())] = append(bySize[uint64(st.Size())], h)
+			}
+		}
+		db.mu.Lock()
+		db.bySize = bySize
+		db.mu.Unlock()
+	})
+}
+
+func (db *HashDB) addSource(digest, url string) {
+	db.mu.Lock()
+	db.src[digest] = url
+	db.mu.Unlock()
+}
+
+// forget drops every entry pointing at one of paths — digest, CRC and source
+// alike — so an evicted file counts as new if it is ever fetched again.
+// paths are absolute; relative entries are resolved before comparing.
+func (db *HashDB) forget(paths []string) int {
+	gone := make(map[string]bool, len(paths))
+	for _, p := range paths {
+		gone[p] = true
+	}
+	db.mu.Lock()
+	defer db.mu.Unlock()
+	digests := make(map[string]bool)
+	for h, p := range db.data {
+		if gone[p] || gone[db.abs(p)] {
+			delete(db.data, h)
+			delete(db.src, h)
+			db.drop(h)
+			digests[h] = true
+		}
+	}
+	for k, h := range db.crc {
+		if digests[h] {
+			delete(db.crc, k)
+		}
+	}
+	return len(digests)
+}
+
+// drop records a tombstone for digest. Callers hold mu.
+func (db *HashDB) drop(digest string) {
+	db.dropped[digest] = true
+	delete(db.dirty, digest)
+}
+
+// save merges with what is on disk (see mergeDisk), then writes all three files.
+func (db *HashDB) save() error {
+	db.mu.Lock()
+	defer db.mu.Unlock()
+	db.mergeDisk()
 	raw, err := json.MarshalIndent(db.data, "", "  ")
 	if err != nil {
 		return err
 	}
-	return os.WriteFile(db.path, raw, 0644)
+	if err := os.WriteFile(db.path, raw, 0644); err != nil {
+		return err
+	}
+	if st, err := os.Stat(db.path); err == nil {
+		db.mod = st.ModTime()
+	}
+	db.dirty = make(map[string]bool)
+	db.dropped = make(map[string]bool)
+	raw, err = json.Marshal(db.crc)
+	if err != nil {
+		return err
+	}
+	if err := os.WriteFile(crcPath(db.path), raw, 0644); err != nil {
+		return err
+	}
+	raw, err = json.Marshal(db.src)
+	if err != nil {
+		return err
+	}
+	return os.WriteFile(srcPath(db.path), raw, 0644)
 }
 
 func (db *HashDB) cleanup() int {
@@ -52,8 +321,9 @@ func (db *HashDB) cleanup() int {
 	defer db.mu.Unlock()
 	removed := 0
 	for h, p := range db.data {
-		if _, err := os.Stat(p); os.IsNotExist(err) {
+		if _, err := os.Stat(db.abs(p)); os.IsNotExist(err) {
 			delete(db.data, h)
+			db.drop(h)
 			removed++
 		}
 	}
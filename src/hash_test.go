@@ -0,0 +1,103 @@
+package main
+
+import (
+	"encoding/json"
+	"hash/crc32"
+	"os"
+	"path/filepath"
+	"testing"
+)
+
+func writeJSON(t *testing.T, path string, v any) {
+	t.Helper()
+	raw, _ := json.Marshal(v)
+	if err := os.WriteFile(path, raw, 0644); err != nil {
+		t.Fatal(err)
+	}
+}
+
+func readJSON(t *testing.T, path string) map[string]string {
+	t.Helper()
+	var m map[string]string
+	raw, err := os.ReadFile(path)
+	if err != nil {
+		t.Fatal(err)
+	}
+	_ = json.Unmarshal(raw, &m)
+	return m
+}
+
+// A save must keep what the Python side wrote meanwhile, and must not bring
+// back what either side deleted.
+func TestSaveMergesDisk(t *testing.T) {
+	path := filepath.Join(t.TempDir(), "hashes.json")
+	writeJSON(t, path, map[string]string{"kept": "/w/kept.jpg", "evicted": "/w/e.jpg", "moved": "/w/m.png", "forgot": "/w/f.jpg"})
+	db := loadHashDB(path)
+
+	db.add("new", "/w/new.jpg")
+	db.addCRC(1, 10, "new")
+	db.forget([]string{"/w/f.jpg"})
+	// Meanwhile the Python side evicts one file, transcodes another and imports a third.
+	writeJSON(t, path, map[string]string{"kept": "/w/kept.jpg", "moved": "/w/m.webp", "forgot": "/w/f.jpg", "imported": "/w/i.jpg"})
+	writeJSON(t, srcPath(path), map[string]string{"imported": "https://example/i.jpg"})
+
+	if err := db.save(); err != nil {
+		t.Fatal(err)
+	}
+	got := readJSON(t, path)
+	want := map[string]string{"kept": "/w/kept.jpg", "moved": "/w/m.webp", "imported": "/w/i.jpg", "new": "/w/new.jpg"}
+	if len(got) != len(want) {
+		t.Fatalf("got %v, want %v", got, want)
+	}
+	for h, p := range want {
+		if got[h] != p {
+			t.Errorf("%s: got %q, want %q", h, got[h], p)
+		}
+	}
+	if readJSON(t, srcPath(path))["imported"] == "" {
+		t.Error("src sidecar entry from disk lost")
+	}
+	if !db.hasCRC(1, 10) {
+		t.Error("CRC of new download lost")
+	}
+	if db.has("evicted") {
+		t.Error("evicted entry still in memory after save")
+	}
+}
+
+// With only part of the library CRC-indexed, the zip pre-filter still
+// recognises the rest — reading only files whose size matches an entry.
+func TestCRCPrefilterPartialIndex(t *testing.T) {
+	dir := t.TempDir()
+	db := loadHashDB(filepath.Join(dir, "hashes.json"))
+	files := map[string]string{"a": "indexed!", "b": "older", "c": "also older"}
+	for h, body := range files {
+		p := filepath.Join(dir, h+".png")
+		if err := os.WriteFile(p, []byte(body), 0644); err != nil {
+			t.Fatal(err)
+		}
+		db.add(h, p)
+	}
+	crcOf := func(s string) uint32 { return crc32.ChecksumIEEE([]byte(s)) }
+	db.addCRC(crcOf("indexed!"), 8, "a")
+	db.indexSizes()
+
+	if len(db.bySize) != 2 {
+		t.Fatalf("bySize = %v, want the two unindexed files", db.bySize)
+	}
+	if !db.hasCRC(crcOf("indexed!"), 8) {
+		t.Error("indexed file not recognised")
+	}
+	if db.hasCRC(crcOf("other"), 5) {
+		t.Error("same size, different CRC matched")
+	}
+	if !db.hasCRC(crcOf("older"), 5) {
+		t.Error("unindexed file not recognised after lazy CRC")
+	}
+	if _, pending := db.bySize[uint64(len("also older"))]; !pending {
+		t.Error("file of another size was read")
+	}
+	if !db.hasCRC(crcOf("also older"), 10) {
+		t.Error("second unindexed file not recognised")
+	}
+}
@@ -7,6 +7,7 @@ import (
 	"net"
 	"os"
 	"os/signal"
+	"path/filepath"
 	"runtime"
 	"strconv"
 	"strings"
@@ -19,17 +20,28 @@ import (
 // ── Protocol types ─────────────────────────────────────────────────────────────
 
 type Cmd struct {
-	Cmd      string `json:"cmd"`
-	Wdir     string `json:"wdir,omitempty"`
-	HashPath string `json:"hash_path,omitempty"`
-	Workers  int    `json:"workers,omitempty"`
-	Target   int    `json:"target,omitempty"` // 0 = unlimited
-	Query    string `json:"query,omitempty"`
-	Page     int    `json:"page,omitempty"`
-	Dest     string `json:"dest,omitempty"`
-	Slug     string `json:"slug,omitempty"`
-	ColID    string `json:"col_id,omitempty"`
-	Count    int    `json:"count,omitempty"`
+	Cmd      string          `json:"cmd"`
+	Wdir     string          `json:"wdir,omitempty"`
+	HashPath string          `json:"hash_path,omitempty"`
+	Workers  int             `json:"workers,omitempty"`
+	Target   int             `json:"target,omitempty"` // 0 = unlimited
+	Query    string          `json:"query,omitempty"`
+	Page     int             `json:"page,omitempty"`
+	Offset   int             `json:"offset,omitempty"` // stream: results of Query already consumed
+	Dest     string          `json:"dest,omitempty"`
+	Slug     string          `json:"slug,omitempty"`
+	ColID    string          `json:"col_id,omitempty"`
+	Count    int             `json:"count,omitempty"`
+	Manifest []ManifestEntry `json:"manifest,omitempty"`
+	Paths    []string        `json:"paths,omitempty"`  // forget
+	Job      string          `json:"job,omitempty"`    // echoed in every event of this command
+	Prio     string          `json:"prio,omitempty"`   // bulk | interactive (default by command)
+	Layout   string          `json:"layout,omitempty"` // layout: flat | store (root = wdir)
+
+	// set_limits: KiB/s, 0 = unlimited, omitted = unchanged
+	GlobalKBps      *int64 `json:"global_kbps,omitempty"`
+	BulkKBps        *int64 `json:"bulk_kbps,omitempty"`
+	InteractiveKBps *int64 `json:"interactive_kbps,omitempty"`
 }
 
 type Event struct {
@@ -38,7 +50,7 @@ type Event struct {
 	Dupes   int64       `json:"dupes,omitempty"`
 	Errors  int64       `json:"errors,omitempty"`
 	Total   int         `json:"total,omitempty"`
-	Wait    int         `json:"wait,omitempty"`
+	Wait    int         `json:"wait,omitempty"` // stream: seconds until API budget frees up
 	Msg     string      `json:"msg,omitempty"`
 	Topics  interface{} `json:"topics,omitempty"`
 	Cols    interface{} `json:"cols,omitempty"`
@@ -46,8 +58,12 @@ type Event struct {
 	ResH    int         `json:"res_h,omitempty"`
 	DlW     int         `json:"dl_w,omitempty"`
 	DlH     int         `json:"dl_h,omitempty"`
-	Speed   float64     `json:"speed,omitempty"` // files/sec
+	Speed   float64     `json:"speed,omitempty"`   // files/sec
 	Elapsed float64     `json:"elapsed,omitempty"` // seconds since download started
+	Entry   int         `json:"entry,omitempty"`   // batch: 1-based manifest entry
+	Label   string      `json:"label,omitempty"`   // batch: entry description
+	Job     string      `json:"job,omitempty"`     // tag from the originating command
+	Limits  *Limits     `json:"limits,omitempty"`
 }
 
 // ── Transport selection ───────────────────────────────────────────────────────
@@ -90,6 +106,13 @@ var builtinRepos = []RepoSpec{
 	{"erickmartin890-anime", "erickmartin890", "Anime-Wallpapers", "", ""},
 }
 
+// streamReserve is the number of hourly Unsplash calls the slideshow stream
+// leaves for interactive use.
+const streamReserve = 10
+
+// shutdownGrace is how long shutdown waits for cancelled jobs to unwind.
+const shutdownGrace = 5 * time.Second
+
 // ── Session ───────────────────────────────────────────────────────────────────
 
 type session struct {
@@ -108,52 +131,57 @@ func newSession(hashPath string, workers int) *session {
 }
 
 // ── Connection handler ────────────────────────────────────────────────────────
+//
+// Commands on one connection run concurrently: each becomes a Job whose
+// events carry the client's "job" tag, so an interactive search can run (and
+// preempt bandwidth, see throttle.go) while a bulk download is in progress.
+// Quick control commands are answered inline, in order.
 
 func handleConn(conn net.Conn, sess *session) {
 	defer conn.Close()
+	var jobs sync.WaitGroup
+	stopping := false
+	defer func() {
+		if !stopping {
+			jobs.Wait()
+			return
+		}
+		// Cancelled jobs unwind at their next read or request; one asleep in
+		// the Unsplash rate limiter could take an hour, so don't wait forever.
+		done := make(chan struct{})
+		go func() { jobs.Wait(); close(done) }()
+		select {
+		case <-done:
+		case <-time.After(shutdownGrace):
+		}
+	}()
 	enc := json.NewEncoder(conn)
+	var encMu sync.Mutex
+	send := func(ev Event) {
+		encMu.Lock()
+		_ = enc.Encode(ev)
+		encMu.Unlock()
+	}
 	scanner := bufio.NewScanner(conn)
 	scanner.Buffer(make([]byte, 4*1024*1024), 4*1024*1024)
 
-	emit := func(ev Event) { _ = enc.Encode(ev) }
-
-	// Progress callback that also emits speed + elapsed.
-	mkProg := func(accumNew, accumDupe, accumErr *int64, start time.Time) progressFn {
-		var mu sync.Mutex
-		return func(n, d, e int) {
-			mu.Lock()
-			defer mu.Unlock()
-			*accumNew += int64(n)
-			*accumDupe += int64(d)
-			*accumErr += int64(e)
-			elapsed := time.Since(start).Seconds()
-			speed := 0.0
-			if elapsed > 0 {
-				speed = float64(*accumNew) / elapsed
-			}
-			emit(Event{
-				Event:   "progress",
-				New:     *accumNew,
-				Dupes:   *accumDupe,
-				Errors:  *accumErr,
-				Speed:   speed,
-				Elapsed: elapsed,
-			})
-		}
-	}
-
 	for scanner.Scan() {
 		var cmd Cmd
 		if err := json.Unmarshal(scanner.Bytes(), &cmd); err != nil {
-			emit(Event{Event: "error", Msg: "bad json: " + err.Error()})
+			send(Event{Event: "error", Msg: "bad json: " + err.Error()})
 			continue
 		}
+		emit := func(ev Event) {
+			ev.Job = cmd.Job
+			send(ev)
+		}
 
 		switch strings.ToLower(cmd.Cmd) {
 
 		// ── ping ───────────────────────────────────────────────────────────────
 		case "ping":
 			emit(Event{Event: "pong"})
+			continue
 
 		// ── resolution ────────────────────────────────────────────────────────
 		case "resolution":
@@ -166,196 +194,347 @@ func handleConn(conn net.Conn, sess *session) {
 				ResW:  res.W, ResH: res.H,
 				DlW: dlW, DlH: dlH,
 			})
+			continue
 
-		// ── scan ──────────────────────────────────────────────────────────────
-		case "scan":
-			var repoTotal, unspTotal int64
-			var scanWg sync.WaitGroup
-
-			scanWg.Add(1)
-			go func() {
-				defer scanWg.Done()
-				atomic.StoreInt64(&repoTotal, int64(CountAllRepos(builtinRepos)))
-			}()
-
-			scanWg.Add(1)
-			go func() {
-				defer scanWg.Done()
-				topics, err := sess.cli.Topics()
-				if err == nil {
-					var t int64
-					for _, tp := range topics {
-						t += int64(tp.Total)
-					}
-					atomic.StoreInt64(&unspTotal, t)
-				} else {
-					atomic.StoreInt64(&unspTotal, 1500)
-				}
-			}()
-
-			scanWg.Wait()
-			emit(Event{Event: "scan_result",
-				Total: int(atomic.LoadInt64(&repoTotal) + atomic.LoadInt64(&unspTotal))})
-
-		// ── download ──────────────────────────────────────────────────────────
-		//
-		// Pipeline:
-		//   Phase 1 — resolve branches + start downloads immediately as each resolves
-		//             (16 concurrent archive downloads, no waiting for all 19)
-		//   Phase 2 — Unsplash topics: multiple topics pipelined concurrently
-		//             (page N+1 fetch overlaps with page N image downloads)
-		//   Phase 3 — random fill to hit exact target
+		// ── bandwidth limits ──────────────────────────────────────────────────
 		//
-		case "download":
-			workers := sess.workers
-			if cmd.Workers > 0 {
-				workers = cmd.Workers
+		// set_limits applies immediately, including to running jobs. Fields
+		// left out of the command keep their current value.
+		case "set_limits":
+			l := bw.Limits()
+			if cmd.GlobalKBps != nil {
+				l.GlobalKBps = *cmd.GlobalKBps
 			}
-			wdir := cmd.Wdir
-			capN := int64(cmd.Target)
-			var capPtr *int64
-			if capN > 0 {
-				capPtr = &capN
+			if cmd.BulkKBps != nil {
+				l.BulkKBps = *cmd.BulkKBps
 			}
-			var totalNew, totalDupe, totalErr int64
-			start := time.Now()
-			prog := mkProg(&totalNew, &totalDupe, &totalErr, start)
-
-			// Phase 1: pipelined branch resolution + concurrent archive downloads
-			emit(Event{Event: "progress", New: 0, Dupes: 0, Errors: 0, Msg: "resolving"})
-			ResolveAndDownload(builtinRepos, wdir, workers, 16, sess.db, prog, capPtr)
-
-			// Phase 2: Unsplash topics — concurrent with page-ahead pipelining
-			if capPtr == nil || atomic.LoadInt64(capPtr) > 0 {
-				topics, err := sess.cli.Topics()
-				if err == nil {
-					downloadTopicsConcurrent(topics, wdir, workers, sess.cli, sess.db, prog, capPtr)
-				}
+			if cmd.InteractiveKBps != nil {
+				l.InteractiveKBps = *cmd.InteractiveKBps
 			}
+			bw.SetLimits(l)
+			fallthrough
+		case "limits":
+			l := bw.Limits()
+			emit(Event{Event: "limits", Limits: &l})
+			continue
 
-			// Phase 3: random fill
-			for capPtr != nil && atomic.LoadInt64(capPtr) > 0 {
-				need := int(atomic.LoadInt64(capPtr))
-				if need > 30 {
-					need = 30
-				}
-				photos, err := sess.cli.Random(need)
-				if err != nil || len(photos) == 0 {
-					break
-				}
-				s := DownloadPhotos(photos, wdir, workers, sess.db, prog)
-				if s.New == 0 {
-					break
+		// ── library layout ────────────────────────────────────────────────────
+		//
+		// layout sets the library root (wdir) and whether saves go flat or
+		// into the sharded store (see store.go). Applies to later saves.
+		case "layout":
+			emit(Event{Event: "layout", Msg: sess.db.setLayout(cmd.Layout, cmd.Wdir)})
+			continue
+
+		// ── shutdown ──────────────────────────────────────────────────────────
+		case "shutdown":
+			stopping = true
+			bw.CancelAll()
+			emit(Event{Event: "bye"})
+			return
+		}
+
+		// Pick up hashes.json edits made by the Python side between commands.
+		sess.db.refresh()
+		jobs.Add(1)
+		go func() {
+			defer jobs.Done()
+			job := bw.Start(cmd.Job, cmdPriority(cmd.Cmd, cmd.Prio))
+			defer job.Done()
+			sess.run(cmd, emit, job)
+		}()
+	}
+}
+
+// mkProg returns a progress callback that also emits speed + elapsed.
+func mkProg(emit func(Event), accumNew, accumDupe, accumErr *int64, start time.Time) progressFn {
+	var mu sync.Mutex
+	return func(n, d, e int) {
+		mu.Lock()
+		defer mu.Unlock()
+		*accumNew += int64(n)
+		*accumDupe += int64(d)
+		*accumErr += int64(e)
+		elapsed := time.Since(start).Seconds()
+		speed := 0.0
+		if elapsed > 0 {
+			speed = float64(*accumNew) / elapsed
+		}
+		emit(Event{
+			Event:   "progress",
+			New:     *accumNew,
+			Dupes:   *accumDupe,
+			Errors:  *accumErr,
+			Speed:   speed,
+			Elapsed: elapsed,
+		})
+	}
+}
+
+// run executes one job command, emitting its events through emit.
+func (sess *session) run(cmd Cmd, emit func(Event), job *Job) {
+	switch strings.ToLower(cmd.Cmd) {
+
+	// ── scan ──────────────────────────────────────────────────────────────
+	case "scan":
+		var repoTotal, unspTotal int64
+		var scanWg sync.WaitGroup
+
+		scanWg.Add(1)
+		go func() {
+			defer scanWg.Done()
+			atomic.StoreInt64(&repoTotal, int64(CountAllRepos(builtinRepos, sess.cli.res)))
+		}()
+
+		scanWg.Add(1)
+		go func() {
+			defer scanWg.Done()
+			topics, err := sess.cli.Topics()
+			if err == nil {
+				var t int64
+				for _, tp := range topics {
+					t += int64(tp.Total)
 				}
+				atomic.StoreInt64(&unspTotal, t)
+			} else {
+				atomic.StoreInt64(&unspTotal, 1500)
 			}
+		}()
+
+		scanWg.Wait()
+		emit(Event{Event: "scan_result",
+			Total: int(atomic.LoadInt64(&repoTotal) + atomic.LoadInt64(&unspTotal))})
+
+	// ── download ──────────────────────────────────────────────────────────
+	//
+	// Pipeline:
+	//   Phase 1 — resolve branches + start downloads immediately as each resolves
+	//             (16 concurrent archive downloads, no waiting for all 19)
+	//   Phase 2 — Unsplash topics: multiple topics pipelined concurrently
+	//             (page N+1 fetch overlaps with page N image downloads)
+	//   Phase 3 — random fill to hit exact target
+	//
+	case "download":
+		workers := sess.workers
+		if cmd.Workers > 0 {
+			workers = cmd.Workers
+		}
+		wdir := cmd.Wdir
+		capN := int64(cmd.Target)
+		var capPtr *int64
+		if capN > 0 {
+			capPtr = &capN
+		}
+		var totalNew, totalDupe, totalErr int64
+		start := time.Now()
+		prog := mkProg(emit, &totalNew, &totalDupe, &totalErr, start)
 
-			_ = sess.db.save()
-			emit(Event{
-				Event:   "done",
-				New:     totalNew,
-				Dupes:   totalDupe,
-				Errors:  totalErr,
-				Elapsed: time.Since(start).Seconds(),
-			})
+		// Phase 1: pipelined branch resolution + concurrent archive downloads
+		emit(Event{Event: "progress", New: 0, Dupes: 0, Errors: 0, Msg: "resolving"})
+		ResolveAndDownload(builtinRepos, wdir, sess.cli.res, workers, 16, sess.db, prog, capPtr, job)
 
-		// ── unsplash: list topics ──────────────────────────────────────────────
-		case "topics":
+		// Phase 2: Unsplash topics — concurrent with page-ahead pipelining
+		if job.err() == nil && (capPtr == nil || atomic.LoadInt64(capPtr) > 0) {
 			topics, err := sess.cli.Topics()
-			if err != nil {
-				emit(Event{Event: "error", Msg: err.Error()})
-				continue
+			if err == nil {
+				downloadTopicsConcurrent(topics, wdir, workers, sess.cli, sess.db, prog, capPtr, job)
 			}
-			emit(Event{Event: "topics", Topics: topics})
+		}
 
-		// ── unsplash: topic photos ────────────────────────────────────────────
-		case "topic_photos":
-			workers := sess.workers
-			if cmd.Workers > 0 {
-				workers = cmd.Workers
+		// Phase 3: random fill — ranked like the topics; a few rounds that
+		// bring nothing new (all dupes or unsuitable) mean the pool is dry.
+		for misses := 0; job.err() == nil && capPtr != nil && atomic.LoadInt64(capPtr) > 0 && misses < 3; {
+			need := int(atomic.LoadInt64(capPtr))
+			if need > 30 {
+				need = 30
 			}
-			photos, err := sess.cli.TopicPhotos(cmd.Slug, cmd.Page)
-			if err != nil {
-				emit(Event{Event: "error", Msg: err.Error()})
-				continue
+			photos, err := sess.cli.Random(need)
+			if err != nil || len(photos) == 0 {
+				break
 			}
-			var n, d, e int64
-			prog := mkProg(&n, &d, &e, time.Now())
-			DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog)
-			_ = sess.db.save()
-			emit(Event{Event: "done", New: n, Dupes: d, Errors: e})
-
-		// ── unsplash: search ──────────────────────────────────────────────────
-		case "search":
-			workers := sess.workers
-			if cmd.Workers > 0 {
-				workers = cmd.Workers
+			photos = sess.cli.res.rankPhotos(photos, true)
+			s := DownloadPhotos(photos, sess.db.viewDir(wdir, filepath.Join("unsplash", "random")), workers, sess.db, prog, capPtr, job)
+			if s.New == 0 {
+				misses++
 			}
-			photos, err := sess.cli.Search(cmd.Query, cmd.Page)
-			if err != nil {
-				emit(Event{Event: "error", Msg: err.Error()})
-				continue
-			}
-			var n, d, e int64
-			prog := mkProg(&n, &d, &e, time.Now())
-			DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog)
-			_ = sess.db.save()
-			emit(Event{Event: "done", New: n, Dupes: d, Errors: e})
-
-		// ── unsplash: list collections ────────────────────────────────────────
-		case "collections":
-			cols, err := sess.cli.Collections(cmd.Page)
-			if err != nil {
-				emit(Event{Event: "error", Msg: err.Error()})
-				continue
-			}
-			emit(Event{Event: "collections", Cols: cols})
+		}
 
-		// ── unsplash: collection photos ───────────────────────────────────────
-		case "col_photos":
-			workers := sess.workers
-			if cmd.Workers > 0 {
-				workers = cmd.Workers
-			}
-			photos, err := sess.cli.CollectionPhotos(cmd.ColID, cmd.Page)
-			if err != nil {
-				emit(Event{Event: "error", Msg: err.Error()})
-				continue
-			}
-			var n, d, e int64
-			prog := mkProg(&n, &d, &e, time.Now())
-			DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog)
-			_ = sess.db.save()
-			emit(Event{Event: "done", New: n, Dupes: d, Errors: e})
-
-		// ── unsplash: random ──────────────────────────────────────────────────
-		case "random":
-			workers := sess.workers
-			if cmd.Workers > 0 {
-				workers = cmd.Workers
-			}
-			n := cmd.Count
-			if n <= 0 {
-				n = 15
-			}
-			photos, err := sess.cli.Random(n)
-			if err != nil {
-				emit(Event{Event: "error", Msg: err.Error()})
-				continue
-			}
-			var sn, sd, se int64
-			prog := mkProg(&sn, &sd, &se, time.Now())
-			DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog)
-			_ = sess.db.save()
-			emit(Event{Event: "done", New: sn, Dupes: sd, Errors: se})
+		_ = sess.db.save()
+		emit(Event{
+			Event:   "done",
+			New:     totalNew,
+			Dupes:   totalDupe,
+			Errors:  totalErr,
+			Elapsed: time.Since(start).Seconds(),
+		})
+
+	// ── unsplash: list topics ──────────────────────────────────────────────
+	case "topics":
+		topics, err := sess.cli.Topics()
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
+			return
+		}
+		emit(Event{Event: "topics", Topics: topics})
 
-		// ── shutdown ──────────────────────────────────────────────────────────
-		case "shutdown":
-			emit(Event{Event: "bye"})
+	// ── unsplash: topic photos ────────────────────────────────────────────
+	case "topic_photos":
+		workers := sess.workers
+		if cmd.Workers > 0 {
+			workers = cmd.Workers
+		}
+		photos, err := sess.cli.TopicPhotos(cmd.Slug, cmd.Page)
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
+			return
+		}
+		var n, d, e int64
+		prog := mkProg(emit, &n, &d, &e, time.Now())
+		DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog, nil, job)
+		_ = sess.db.save()
+		emit(Event{Event: "done", New: n, Dupes: d, Errors: e})
+
+	// ── unsplash: search ──────────────────────────────────────────────────
+	case "search":
+		workers := sess.workers
+		if cmd.Workers > 0 {
+			workers = cmd.Workers
+		}
+		photos, err := sess.cli.Search(cmd.Query, cmd.Page)
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
+			return
+		}
+		var n, d, e int64
+		prog := mkProg(emit, &n, &d, &e, time.Now())
+		DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog, nil, job)
+		_ = sess.db.save()
+		emit(Event{Event: "done", New: n, Dupes: d, Errors: e})
+
+	// ── unsplash: list collections ────────────────────────────────────────
+	case "collections":
+		cols, err := sess.cli.Collections(cmd.Page)
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
 			return
+		}
+		emit(Event{Event: "collections", Cols: cols})
 
-		default:
-			emit(Event{Event: "error", Msg: "unknown command: " + cmd.Cmd})
+	// ── unsplash: collection photos ───────────────────────────────────────
+	case "col_photos":
+		workers := sess.workers
+		if cmd.Workers > 0 {
+			workers = cmd.Workers
+		}
+		photos, err := sess.cli.CollectionPhotos(cmd.ColID, cmd.Page)
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
+			return
+		}
+		var n, d, e int64
+		prog := mkProg(emit, &n, &d, &e, time.Now())
+		DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog, nil, job)
+		_ = sess.db.save()
+		emit(Event{Event: "done", New: n, Dupes: d, Errors: e})
+
+	// ── unsplash: random ──────────────────────────────────────────────────
+	case "random":
+		workers := sess.workers
+		if cmd.Workers > 0 {
+			workers = cmd.Workers
+		}
+		n := cmd.Count
+		if n <= 0 {
+			n = 15
+		}
+		photos, err := sess.cli.Random(n)
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
+			return
 		}
+		var sn, sd, se int64
+		prog := mkProg(emit, &sn, &sd, &se, time.Now())
+		DownloadPhotos(photos, cmd.Dest, workers, sess.db, prog, nil, job)
+		_ = sess.db.save()
+		emit(Event{Event: "done", New: sn, Dupes: sd, Errors: se})
+
+	// ── unsplash: stream fetch-ahead ──────────────────────────────────────
+	//
+	// Tops up a slideshow queue with up to count new photos (random, or
+	// page of query). Background work never spends the last streamReserve
+	// API calls of the hour, and never waits for them: when the budget is
+	// short it answers at once with wait = seconds until it isn't.
+	case "stream":
+		if ok, wait := sess.cli.rl.Budget(streamReserve); !ok {
+			emit(Event{Event: "done", Wait: int(wait.Seconds()) + 1})
+			return
+		}
+		n := cmd.Count
+		if n <= 0 {
+			n = 5
+		}
+		var photos []PhotoMeta
+		var err error
+		if cmd.Query != "" {
+			// The offset is a cursor into the results: fetch the page holding
+			// it and start there, so nothing past the first n is lost. Total
+			// in "done" tells the client how far to advance.
+			photos, err = sess.cli.Search(cmd.Query, cmd.Offset/pageSz+1)
+			if skip := cmd.Offset % pageSz; skip < len(photos) {
+				photos = photos[skip:]
+			} else {
+				photos = nil
+			}
+		} else {
+			photos, err = sess.cli.Random(n)
+		}
+		if err != nil {
+			emit(Event{Event: "error", Msg: err.Error()})
+			return
+		}
+		if len(photos) > n {
+			photos = photos[:n]
+		}
+		var sn, sd, se int64
+		prog := mkProg(emit, &sn, &sd, &se, time.Now())
+		DownloadPhotos(photos, cmd.Dest, sess.workers, sess.db, prog, nil, job)
+		_ = sess.db.save()
+		emit(Event{Event: "done", New: sn, Dupes: sd, Errors: se, Total: len(photos)})
+
+	// ── forget ────────────────────────────────────────────────────────────
+	//
+	// Drops evicted files from the hash DB (see forget in hash.go).
+	case "forget":
+		n := sess.db.forget(cmd.Paths)
+		_ = sess.db.save()
+		emit(Event{Event: "done", Total: n})
+
+	// ── unsplash: batch manifest ──────────────────────────────────────────
+	//
+	// One pipelined job for a whole manifest of searches, topics and
+	// collections. Progress events carry entry/label; "done" has totals.
+	case "batch":
+		workers := sess.workers
+		if cmd.Workers > 0 {
+			workers = cmd.Workers
+		}
+		if len(cmd.Manifest) == 0 {
+			emit(Event{Event: "error", Msg: "empty manifest"})
+			return
+		}
+		start := time.Now()
+		s := RunBatch(cmd.Manifest, cmd.Dest, workers, sess.cli, sess.db, job, emit)
+		_ = sess.db.save()
+		emit(Event{
+			Event:   "done",
+			New:     s.New,
+			Dupes:   s.Dupes,
+			Errors:  s.Errors,
+			Elapsed: time.Since(start).Seconds(),
+		})
+
+	default:
+		emit(Event{Event: "error", Msg: "unknown command: " + cmd.Cmd})
 	}
 }
 
@@ -373,6 +552,7 @@ func downloadTopicsConcurrent(
 	db *HashDB,
 	prog progressFn,
 	capRemaining *int64,
+	job *Job,
 ) {
 	const topicConcurrency = 4
 	sem := make(chan struct{}, topicConcurrency)
@@ -396,14 +576,17 @@ func downloadTopicsConcurrent(
 			go func() {
 				defer close(pageCh)
 				for page := 1; ; page++ {
-					if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
+					if job.err() != nil || capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
 						return
 					}
 					photos, err := cli.TopicPhotos(topic.Slug, page)
 					if err != nil || len(photos) == 0 {
 						return
 					}
-					pageCh <- photos
+					// Best matches first; a page with none left is skipped.
+					if photos = cli.res.rankPhotos(photos, capRemaining != nil); len(photos) > 0 {
+						pageCh <- photos
+					}
 				}
 			}()
 
@@ -411,7 +594,7 @@ func downloadTopicsConcurrent(
 				if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
 					break
 				}
-				DownloadPhotos(photos, wdir, workers, db, prog)
+				DownloadPhotos(photos, db.viewDir(wdir, filepath.Join("unsplash", "topics", topic.Slug)), workers, db, prog, capRemaining, job)
 			}
 		}(t)
 	}
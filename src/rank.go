@@ -0,0 +1,92 @@
+package main
+
+import (
+	"math"
+	"path/filepath"
+	"regexp"
+	"sort"
+	"strconv"
+)
+
+// ── Ranking candidates against the screen ─────────────────────────────────────
+//
+// Both sources describe an image before we fetch it: the tree API gives every
+// blob's byte size (and wallpaper repos often put WxH in the file name), and
+// Unsplash gives every photo's width and height. fit turns that into a score
+// in (0, 1] for the detected Resolution, plus whether the image is eligible
+// (clears minCover and minAspect). A capped download drops ineligible images
+// and fetches the rest in score order, so the cap fills with the best matches
+// first; scan counts what a capped download can get. Full syncs download
+// everything, eligible or not — the thresholds only decide what a cap spends
+// itself on.
+
+const (
+	minCover  = 0.75 // must cover ≥75% of the screen's width and height
+	minAspect = 0.6  // and keep ≥60% of itself when cropped to the screen's aspect
+
+	// Size-only estimates: a full-screen wallpaper weighs about this many
+	// bytes per screen pixel. Flat artwork compresses far better than photos,
+	// so the size-only threshold is looser than minCover.
+	bytesPerPx   = 0.15
+	minSizeCover = 0.5
+	sizeOnlyFit  = 0.9 // aspect unknown: rank below files known to fit
+)
+
+// nameDims finds "1920x1080"-style dimensions in a file name.
+var nameDims = regexp.MustCompile(`(\d{3,5})\s*[x×X]\s*(\d{3,5})`)
+
+// fit scores a w×h image: coverage of the screen (capped at 1 — pixels past
+// the screen add nothing) times the share of the image that survives the crop.
+// ok reports whether the image clears minCover and minAspect.
+func (r Resolution) fit(w, h int) (score float64, ok bool) {
+	if w <= 0 || h <= 0 || r.W <= 0 || r.H <= 0 {
+		return 0, false
+	}
+	cover := math.Min(float64(w)/float64(r.W), float64(h)/float64(r.H))
+	a, s := float64(w)/float64(h), float64(r.W)/float64(r.H)
+	aspect := math.Min(a, s) / math.Max(a, s)
+	return math.Min(cover, 1) * aspect, cover >= minCover && aspect >= minAspect
+}
+
+// fitBlob scores a repository file from its name and blob size.
+func (r Resolution) fitBlob(path string, size int64) (score float64, ok bool) {
+	if m := nameDims.FindStringSubmatch(filepath.Base(path)); m != nil {
+		w, _ := strconv.Atoi(m[1])
+		h, _ := strconv.Atoi(m[2])
+		return r.fit(w, h)
+	}
+	if size <= 0 || r.W <= 0 || r.H <= 0 {
+		return sizeOnlyFit / 2, true // no information: eligible, ranked low
+	}
+	cover := math.Sqrt(float64(size) / (bytesPerPx * float64(r.W) * float64(r.H)))
+	return math.Min(cover, 1) * sizeOnlyFit, cover >= minSizeCover
+}
+
+// rankPhotos orders photos best first; with strict (a capped download) it
+// also drops the ineligible ones. Photos without dimensions are kept, last.
+func (r Resolution) rankPhotos(photos []PhotoMeta, strict bool) []PhotoMeta {
+	out := photos[:0]
+	for _, p := range photos {
+		ok := true
+		p.Score = sizeOnlyFit / 2
+		if p.W > 0 && p.H > 0 {
+			p.Score, ok = r.fit(p.W, p.H)
+		}
+		if ok || !strict {
+			out = append(out, p)
+		}
+	}
+	sort.SliceStable(out, func(i, j int) bool { return out[i].Score > out[j].Score })
+	return out
+}
+
+// rankImages orders tree images best first; equal scores prefer the smaller
+// file, since it costs less bandwidth for the same result on screen.
+func rankImages(imgs []treeImage) {
+	sort.SliceStable(imgs, func(i, j int) bool {
+		if imgs[i].Score != imgs[j].Score {
+			return imgs[i].Score > imgs[j].Score
+		}
+		return imgs[i].Size < imgs[j].Size
+	})
+}
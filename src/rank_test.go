@@ -0,0 +1,106 @@
+package main
+
+import (
+	"math"
+	"slices"
+	"testing"
+)
+
+var uhd = Resolution{W: 3840, H: 2160}
+
+func near(a, b float64) bool { return math.Abs(a-b) < 1e-9 }
+
+func TestFit(t *testing.T) {
+	for _, c := range []struct {
+		w, h  int
+		score float64
+		ok    bool
+	}{
+		{3840, 2160, 1, true},
+		{7680, 4320, 1, true},                                 // past the screen adds nothing
+		{1920, 1080, 0.5, false},                              // 1080p on 4K: half the coverage
+		{3840, 1800, (1800.0 / 2160) * (1800.0 / 2160), true}, // a little wide
+		{2160, 3840, (2160.0 / 3840) * (2160.0 / 3840) * (2160.0 / 3840), false}, // portrait
+		{0, 2160, 0, false},
+	} {
+		score, ok := uhd.fit(c.w, c.h)
+		if !near(score, c.score) || ok != c.ok {
+			t.Errorf("fit(%d, %d) = %v, %v; want %v, %v", c.w, c.h, score, ok, c.score, c.ok)
+		}
+	}
+	if _, ok := (Resolution{}).fit(1920, 1080); ok {
+		t.Error("fit with an unknown screen reported eligible")
+	}
+}
+
+func TestFitBlob(t *testing.T) {
+	fhd := Resolution{W: 1920, H: 1080}
+	full := int64(bytesPerPx * 1920 * 1080) // the estimate for exactly one screen
+	for _, c := range []struct {
+		path  string
+		size  int64
+		score float64
+		ok    bool
+	}{
+		{"walls/peak_2560x1440.jpg", 1, 1, true},            // the name wins over the size
+		{"walls/peak_1280 x 720.jpg", full, 2.0 / 3, false}, // below minCover by name
+		{"walls/peak.jpg", 0, sizeOnlyFit / 2, true},        // nothing known
+		{"walls/peak.jpg", full, sizeOnlyFit, true},
+		{"walls/peak.jpg", full * 4, sizeOnlyFit, true},
+		{"walls/peak.jpg", full / 16, sizeOnlyFit / 4, false},
+	} {
+		score, ok := fhd.fitBlob(c.path, c.size)
+		if !near(score, c.score) || ok != c.ok {
+			t.Errorf("fitBlob(%q, %d) = %v, %v; want %v, %v", c.path, c.size, score, ok, c.score, c.ok)
+		}
+	}
+}
+
+func photoIDs(ps []PhotoMeta) (ids []string) {
+	for _, p := range ps {
+		ids = append(ids, p.ID)
+	}
+	return ids
+}
+
+func TestRankPhotos(t *testing.T) {
+	photos := func() []PhotoMeta {
+		return []PhotoMeta{
+			{ID: "fhd", W: 1920, H: 1080}, // 0.5, ineligible
+			{ID: "nodims"},                // sizeOnlyFit/2
+			{ID: "wide", W: 3840, H: 1800},
+			{ID: "uhd", W: 3840, H: 2160},
+		}
+	}
+	for _, c := range []struct {
+		strict bool
+		want   []string
+	}{
+		{true, []string{"uhd", "wide", "nodims"}},
+		{false, []string{"uhd", "wide", "fhd", "nodims"}},
+	} {
+		got := uhd.rankPhotos(photos(), c.strict)
+		if ids := photoIDs(got); !slices.Equal(ids, c.want) {
+			t.Errorf("rankPhotos(strict=%v) = %v; want %v", c.strict, ids, c.want)
+		}
+		if got[0].Score != 1 {
+			t.Errorf("rankPhotos(strict=%v) left Score = %v on the best photo", c.strict, got[0].Score)
+		}
+	}
+}
+
+func TestRankImages(t *testing.T) {
+	imgs := []treeImage{
+		{Path: "a", Size: 10, Score: 0.5},
+		{Path: "b", Size: 50, Score: 0.9},
+		{Path: "c", Size: 20, Score: 0.9},
+		{Path: "d", Size: 5, Score: 0.45},
+	}
+	rankImages(imgs)
+	want := []string{"c", "b", "a", "d"} // score desc, then the smaller file
+	for i, img := range imgs {
+		if img.Path != want[i] {
+			t.Fatalf("rankImages order = %v; want %v", imgs, want)
+		}
+	}
+}
@@ -0,0 +1,115 @@
+package main
+
+import (
+	"os"
+	"path/filepath"
+	"strings"
+)
+
+// ── Sharded, content-addressed layout (optional) ──────────────────────────────
+//
+// In the default flat layout every download lands in wdir under its source
+// name, and flatSavePath has to read and hash a same-named file to tell a
+// re-download from a collision. In the "store" layout the bytes live at
+//
+//	<root>/.store/ab/cd/<md5><ext>
+//
+// so the name is the content and saving never reads anything. What the user
+// browses is a view: <root>/<source>/<name> hardlinks (symlinks where links
+// aren't possible) into the store. Hash DB entries under root are kept
+// relative to it, so moving the library is a rename plus a config change.
+
+const storeDir = ".store"
+
+// storePath is the shard a file with this digest lives in.
+func storePath(root, digest, ext string) string {
+	return filepath.Join(root, storeDir, digest[:2], digest[2:4], digest+strings.ToLower(ext))
+}
+
+// setLayout switches the layout for subsequent saves. root is the library
+// root that relative entries are resolved against, in either layout.
+func (db *HashDB) setLayout(layout, root string) string {
+	db.mu.Lock()
+	defer db.mu.Unlock()
+	if root != "" {
+		db.root = filepath.Clean(root)
+	}
+	db.store = layout == "store" && db.root != ""
+	if db.store {
+		return "store"
+	}
+	return "flat"
+}
+
+func (db *HashDB) layout() (root string, store bool) {
+	db.mu.RLock()
+	defer db.mu.RUnlock()
+	return db.root, db.store
+}
+
+// abs resolves a stored entry against the library root. Callers hold mu.
+func (db *HashDB) abs(p string) string {
+	if filepath.IsAbs(p) || db.root == "" {
+		return p
+	}
+	return filepath.Join(db.root, p)
+}
+
+// rel is the form an entry is stored in: relative to root in the store
+// layout, unchanged otherwise (flat libraries keep absolute paths). Callers
+// hold mu.
+func (db *HashDB) rel(p string) string {
+	if !db.store {
+		return p
+	}
+	if r, err := filepath.Rel(db.root, p); err == nil && !strings.HasPrefix(r, "..") {
+		return r
+	}
+	return p
+}
+
+// viewDir is where downloads from one source go: wdir itself when flat, a
+// per-source folder of the view when sharded.
+func (db *HashDB) viewDir(wdir, source string) string {
+	if _, store := db.layout(); !store || source == "" {
+		return wdir
+	}
+	return filepath.Join(wdir, source)
+}
+
+// savePath is where a new file with this digest is written. Sharded saves
+// create their shard directory and never touch existing files.
+func (db *HashDB) savePath(dir, base, digest string) string {
+	root, store := db.layout()
+	if !store {
+		return flatSavePath(dir, base, digest)
+	}
+	p := storePath(root, digest, filepath.Ext(base))
+	_ = os.MkdirAll(filepath.Dir(p), 0755)
+	return p
+}
+
+// link adds a saved file to the view as dir/base. A name already taken (by
+// another image) gets the digest appended — decided from Lstat alone. Link
+// failures are not errors: the file is in the store and the hash DB either way.
+func (db *HashDB) link(dir, base, digest, stored string) {
+	if _, store := db.layout(); !store {
+		return
+	}
+	if os.MkdirAll(dir, 0755) != nil {
+		return
+	}
+	view := filepath.Join(dir, base)
+	if _, err := os.Lstat(view); err == nil {
+		ext := filepath.Ext(base)
+		view = filepath.Join(dir, base[:len(base)-len(ext)]+"_"+digest[:8]+ext)
+	}
+	if os.Link(stored, view) == nil {
+		return
+	}
+	target := stored
+	if r, err := filepath.Rel(dir, stored); err == nil {
+		target = r // relative, so the view survives moving the library
+	}
+	_ = os.Symlink(target, view)
+}
@@ -0,0 +1,312 @@
+package main
+
+// throttle.go — byte-rate scheduling for everything the engine downloads.
+//
+// Every command runs as a Job with a priority class:
+//
+//   - interactive: search, topic/collection pages, random — a user is waiting
+//   - bulk:        full-library download, batch manifests
+//
+// Response bodies are read through Job.wrap, which charges each chunk against
+//   1. the job's own bucket    (per-job cap for its class, 0 = unlimited)
+//   2. the global bucket       (cap for the whole engine, 0 = unlimited)
+// and, while any interactive job has a body open, bulk jobs are held to a
+// shared trickle so the interactive one gets the link. An interactive job
+// waiting on something else (e.g. the Unsplash rate limiter) doesn't hold
+// bulk back. Limits can be changed at any time with the set_limits command;
+// running jobs pick them up on their next read.
+//
+// Cancelled jobs (shutdown) fail their reads and new requests with
+// errJobCancelled, so they unwind instead of finishing their downloads.
+
+import (
+	"errors"
+	"io"
+	"strings"
+	"sync"
+	"sync/atomic"
+	"time"
+)
+
+type Priority int
+
+const (
+	PrioBulk Priority = iota
+	PrioInteractive
+)
+
+const (
+	throttleChunk = 32 << 10 // max bytes charged per Read
+	bulkTrickle   = 64 << 10 // bytes/sec shared by bulk jobs while preempted
+)
+
+var errJobCancelled = errors.New("job cancelled")
+
+func (p Priority) String() string {
+	if p == PrioInteractive {
+		return "interactive"
+	}
+	return "bulk"
+}
+
+// cmdPriority is the default class of an engine command; prio overrides it.
+func cmdPriority(cmd, prio string) Priority {
+	switch strings.ToLower(prio) {
+	case "interactive":
+		return PrioInteractive
+	case "bulk":
+		return PrioBulk
+	}
+	switch strings.ToLower(cmd) {
+	case "search", "topic_photos", "col_photos", "random":
+		return PrioInteractive
+	}
+	return PrioBulk
+}
+
+// Limits are byte rates in KiB/s; 0 means unlimited.
+type Limits struct {
+	GlobalKBps      int64 `json:"global_kbps"`
+	BulkKBps        int64 `json:"bulk_kbps"`        // per bulk job
+	InteractiveKBps int64 `json:"interactive_kbps"` // per interactive job
+}
+
+// ── Token bucket ──────────────────────────────────────────────────────────────
+
+// rateBucket is a token bucket measured in bytes. Callers may overdraw it;
+// reserve returns how long to wait for the debt to be repaid.
+type rateBucket struct {
+	mu     sync.Mutex
+	rate   float64 // bytes/sec, 0 = unlimited
+	tokens float64
+	last   time.Time
+}
+
+func (b *rateBucket) setRate(bps float64) {
+	b.mu.Lock()
+	b.rate = bps
+	if b.tokens > b.burst() {
+		b.tokens = b.burst()
+	}
+	b.mu.Unlock()
+}
+
+// burst allows half a second of traffic, and at least one chunk.
+func (b *rateBucket) burst() float64 {
+	if v := b.rate / 2; v > throttleChunk {
+		return v
+	}
+	return throttleChunk
+}
+
+func (b *rateBucket) refill(now time.Time) {
+	if !b.last.IsZero() {
+		b.tokens += now.Sub(b.last).Seconds() * b.rate
+		if b.tokens > b.burst() {
+			b.tokens = b.burst()
+		}
+	}
+	b.last = now
+}
+
+func (b *rateBucket) reserve(n int) time.Duration {
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	if b.rate <= 0 {
+		return 0
+	}
+	b.refill(time.Now())
+	b.tokens -= float64(n)
+	if b.tokens >= 0 {
+		return 0
+	}
+	return time.Duration(-b.tokens / b.rate * float64(time.Second))
+}
+
+// tryTake takes n bytes only if they are available now (no debt).
+func (b *rateBucket) tryTake(n int) bool {
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	if b.rate <= 0 {
+		return true
+	}
+	b.refill(time.Now())
+	if b.tokens < float64(n) {
+		return false
+	}
+	b.tokens -= float64(n)
+	return true
+}
+
+// ── Scheduler ─────────────────────────────────────────────────────────────────
+
+type Scheduler struct {
+	mu          sync.Mutex
+	limits      Limits
+	jobs        map[*Job]struct{}
+	interactive int32 // open interactive transfers
+	global      rateBucket
+	trickle     rateBucket
+}
+
+// bw is the engine-wide scheduler.
+var bw = newScheduler()
+
+func newScheduler() *Scheduler {
+	s := &Scheduler{jobs: make(map[*Job]struct{})}
+	s.trickle.setRate(bulkTrickle)
+	return s
+}
+
+func (s *Scheduler) classRate(p Priority) float64 {
+	if p == PrioInteractive {
+		return float64(s.limits.InteractiveKBps) * 1024
+	}
+	return float64(s.limits.BulkKBps) * 1024
+}
+
+// SetLimits applies new limits to the global bucket and every running job.
+func (s *Scheduler) SetLimits(l Limits) {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	s.limits = l
+	s.global.setRate(float64(l.GlobalKBps) * 1024)
+	for j := range s.jobs {
+		j.own.setRate(s.classRate(j.prio))
+	}
+}
+
+func (s *Scheduler) Limits() Limits {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return s.limits
+}
+
+// Start registers a job; call Done when it finishes.
+func (s *Scheduler) Start(id string, prio Priority) *Job {
+	j := &Job{id: id, prio: prio, stop: make(chan struct{})}
+	s.mu.Lock()
+	j.own.setRate(s.classRate(prio))
+	s.jobs[j] = struct{}{}
+	s.mu.Unlock()
+	return j
+}
+
+// CancelAll cancels every running job.
+func (s *Scheduler) CancelAll() {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	for j := range s.jobs {
+		j.cancel()
+	}
+}
+
+// ── Job ───────────────────────────────────────────────────────────────────────
+
+// Job is one running command. A nil *Job is unthrottled.
+type Job struct {
+	id   string
+	prio Priority
+	own  rateBucket
+	stop chan struct{} // closed by cancel
+	once sync.Once
+}
+
+func (j *Job) Done() {
+	if j == nil {
+		return
+	}
+	bw.mu.Lock()
+	delete(bw.jobs, j)
+	bw.mu.Unlock()
+}
+
+func (j *Job) cancel() {
+	j.once.Do(func() { close(j.stop) })
+}
+
+// err is errJobCancelled once the job is cancelled, nil before.
+func (j *Job) err() error {
+	if j == nil {
+		return nil
+	}
+	select {
+	case <-j.stop:
+		return errJobCancelled
+	default:
+		return nil
+	}
+}
+
+// charge blocks until n bytes may be consumed by this job.
+func (j *Job) charge(n int) {
+	if j == nil {
+		return
+	}
+	// Bulk yields to interactive work: poll the shared trickle until either
+	// the interactive jobs finish or a trickle slot frees up.
+	for j.prio == PrioBulk && atomic.LoadInt32(&bw.interactive) > 0 {
+		if bw.trickle.tryTake(n) || j.err() != nil {
+			break
+		}
+		time.Sleep(25 * time.Millisecond)
+	}
+	d := j.own.reserve(n)
+	if g := bw.global.reserve(n); g > d {
+		d = g
+	}
+	if d > 0 {
+		time.Sleep(d)
+	}
+}
+
+// wrap returns body read through this job's limits. An interactive body
+// preempts bulk jobs until it hits EOF, fails or is closed.
+func (j *Job) wrap(body io.ReadCloser) io.ReadCloser {
+	if j == nil {
+		return body
+	}
+	t := &throttledBody{ReadCloser: body, job: j}
+	if j.prio == PrioInteractive {
+		atomic.AddInt32(&bw.interactive, 1)
+		t.open = true
+	}
+	return t
+}
+
+type throttledBody struct {
+	io.ReadCloser
+	job  *Job
+	open bool // counted in bw.interactive
+}
+
+// release stops counting the body as an open interactive transfer.
+func (t *throttledBody) release() {
+	if t.open {
+		t.open = false
+		atomic.AddInt32(&bw.interactive, -1)
+	}
+}
+
+func (t *throttledBody) Read(p []byte) (int, error) {
+	if err := t.job.err(); err != nil {
+		t.release()
+		return 0, err
+	}
+	if len(p) > throttleChunk {
+		p = p[:throttleChunk]
+	}
+	n, err := t.ReadCloser.Read(p)
+	if n > 0 {
+		t.job.charge(n)
+	}
+	if err != nil {
+		t.release()
+	}
+	return n, err
+}
+
+func (t *throttledBody) Close() error {
+	t.release()
+	return t.ReadCloser.Close()
+}
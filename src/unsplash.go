@@ -7,6 +7,7 @@ import (
 	"net/http"
 	"net/url"
 	"os"
+	"path/filepath"
 	"sync"
 	"sync/atomic"
 	"time"
@@ -71,11 +72,37 @@ func (rl *RateLimiter) Wait() time.Duration {
 	return 0
 }
 
+// Budget reports whether a call can be made now while still leaving keep
+// calls of the window spare and, if not, how long until it can. Unlike Wait
+// it never blocks, so background work can defer to interactive use.
+func (rl *RateLimiter) Budget(keep int) (ok bool, wait time.Duration) {
+	rl.mu.Lock()
+	defer rl.mu.Unlock()
+	cutoff := time.Now().Add(-rl.window)
+	var fresh []time.Time
+	for _, t := range rl.calls {
+		if t.After(cutoff) {
+			fresh = append(fresh, t)
+		}
+	}
+	allowed := rl.limit - keep
+	if allowed <= 0 {
+		return false, rl.window
+	}
+	if len(fresh) < allowed {
+		return true, 0
+	}
+	// calls are appended in order; wait for enough of the oldest to expire
+	return false, time.Until(fresh[len(fresh)-allowed].Add(rl.window))
+}
+
 // ── Unsplash client ───────────────────────────────────────────────────────────
 
 type unsplashPhoto struct {
-	ID   string `json:"id"`
-	URLs struct {
+	ID     string `json:"id"`
+	Width  int    `json:"width"`
+	Height int    `json:"height"`
+	URLs   struct {
 		Raw string `json:"raw"`
 	} `json:"urls"`
 }
@@ -94,8 +121,10 @@ type unsplashCollection struct {
 
 // PhotoMeta is the normalised form sent back to Python.
 type PhotoMeta struct {
-	ID  string
-	URL string
+	ID    string
+	URL   string
+	W, H  int     // original dimensions, for ranking (rank.go)
+	Score float64 // set by Resolution.rankPhotos
 }
 
 type UnsplashClient struct {
@@ -145,7 +174,7 @@ func (c *UnsplashClient) imageURL(raw string) string {
 func (c *UnsplashClient) normalize(photos []unsplashPhoto) []PhotoMeta {
 	out := make([]PhotoMeta, 0, len(photos))
 	for _, p := range photos {
-		out = append(out, PhotoMeta{ID: p.ID, URL: c.imageURL(p.URLs.Raw)})
+		out = append(out, PhotoMeta{ID: p.ID, URL: c.imageURL(p.URLs.Raw), W: p.Width, H: p.Height})
 	}
 	return out
 }
@@ -212,7 +241,10 @@ func (c *UnsplashClient) TopicPhotos(slug string, page int) ([]PhotoMeta, error)
 		return nil, err
 	}
 	var photos []unsplashPhoto
-	return c.normalize(photos), json.Unmarshal(body, &photos)
+	if err := json.Unmarshal(body, &photos); err != nil {
+		return nil, err
+	}
+	return c.normalize(photos), nil
 }
 
 func (c *UnsplashClient) Collections(page int) ([]unsplashCollection, error) {
@@ -237,7 +269,10 @@ func (c *UnsplashClient) CollectionPhotos(id string, page int) ([]PhotoMeta, err
 		return nil, err
 	}
 	var photos []unsplashPhoto
-	return c.normalize(photos), json.Unmarshal(body, &photos)
+	if err := json.Unmarshal(body, &photos); err != nil {
+		return nil, err
+	}
+	return c.normalize(photos), nil
 }
 
 // ── Concurrent topic downloader ───────────────────────────────────────────────
@@ -248,7 +283,7 @@ func (c *UnsplashClient) CollectionPhotos(id string, page int) ([]PhotoMeta, err
 // here is that we don't wait for topic A to finish before starting topic B.
 func (c *UnsplashClient) DownloadTopicsConcurrent(
 	wdir string, workers int, db *HashDB,
-	prog progressFn, capRemaining *int64,
+	prog progressFn, capRemaining *int64, job *Job,
 ) {
 	topics, err := c.Topics()
 	if err != nil || len(topics) == 0 {
@@ -276,7 +311,10 @@ func (c *UnsplashClient) DownloadTopicsConcurrent(
 				if err != nil || len(photos) == 0 {
 					return
 				}
-				DownloadPhotos(photos, wdir, workers, db, prog)
+				if photos = c.res.rankPhotos(photos, capRemaining != nil); len(photos) == 0 {
+					continue
+				}
+				DownloadPhotos(photos, db.viewDir(wdir, filepath.Join("unsplash", "topics", slug)), workers, db, prog, capRemaining, job)
 			}
 		}(t.Slug)
 	}
@@ -285,9 +323,80 @@ func (c *UnsplashClient) DownloadTopicsConcurrent(
 
 // ── Image downloader ──────────────────────────────────────────────────────────
 
-// DownloadPhotos downloads a slice of PhotoMeta into destDir concurrently.
+// photoResult is the outcome of a single fetchPhoto call.
+type photoResult int
+
+const (
+	photoNew photoResult = iota
+	photoDupe
+	photoErr
+)
+
+// tally applies a photoResult to stats, the progress callback and the cap.
+func tally(res photoResult, stats *DownloadStats, prog progressFn, capRemaining *int64) {
+	switch res {
+	case photoNew:
+		atomic.AddInt64(&stats.New, 1)
+		if capRemaining != nil {
+			atomic.AddInt64(capRemaining, -1)
+		}
+		if prog != nil {
+			prog(1, 0, 0)
+		}
+	case photoDupe:
+		atomic.AddInt64(&stats.Dupes, 1)
+		if prog != nil {
+			prog(0, 1, 0)
+		}
+	default:
+		atomic.AddInt64(&stats.Errors, 1)
+		if prog != nil {
+			prog(0, 0, 1)
+		}
+	}
+}
+
+// fetchPhoto downloads one photo into destDir, skipping it if its MD5 is
+// already in db. destDir must already exist.
+func fetchPhoto(p PhotoMeta, destDir string, db *HashDB, job *Job) photoResult {
+	if job.err() != nil {
+		return photoErr
+	}
+	// Use shared client directly — no rate limit needed for image CDN.
+	req, err := newReq(p.URL)
+	if err != nil {
+		return photoErr
+	}
+	resp, err := SharedClient.Do(req)
+	if err != nil {
+		return photoErr
+	}
+	data, err := io.ReadAll(job.wrap(resp.Body))
+	resp.Body.Close()
+	if err != nil {
+		return photoErr
+	}
+
+	digest := md5hex(data)
+	if db.has(digest) {
+		return photoDupe
+	}
+
+	fname := "unsplash_" + p.ID + ".jpg"
+	outPath := db.savePath(destDir, fname, digest)
+	if err := os.WriteFile(outPath, data, 0644); err != nil {
+		return photoErr
+	}
+	db.link(destDir, fname, digest, outPath)
+	db.add(digest, outPath)
+	db.addSource(digest, p.URL)
+	return photoNew
+}
+
+// DownloadPhotos downloads a slice of PhotoMeta into destDir concurrently,
+// in slice order, stopping once capRemaining (if non-nil) reaches zero.
 func DownloadPhotos(photos []PhotoMeta, destDir string, workers int,
-	db *HashDB, prog progressFn) DownloadStats {
+	db *HashDB, prog progressFn, capRemaining *int64, job *Job) DownloadStats {
 
 	if err := os.MkdirAll(destDir, 0755); err != nil {
 		return DownloadStats{Errors: int64(len(photos))}
@@ -298,62 +407,19 @@ func DownloadPhotos(photos []PhotoMeta, destDir string, workers int,
 	var wg sync.WaitGroup
 
 	for _, photo := range photos {
+		if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
+			break
+		}
 		sem <- struct{}{}
 		wg.Add(1)
 		go func(p PhotoMeta) {
 			defer wg.Done()
 			defer func() { <-sem }()
 
-			// Use shared client directly — no rate limit needed for image CDN.
-			req, err := newReq(p.URL)
-			if err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
+			if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
 				return
 			}
-			resp, err := SharedClient.Do(req)
-			if err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-			data, err := io.ReadAll(resp.Body)
-			resp.Body.Close()
-			if err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-
-			digest := md5hex(data)
-			if db.has(digest) {
-				atomic.AddInt64(&stats.Dupes, 1)
-				if prog != nil {
-					prog(0, 1, 0)
-				}
-				return
-			}
-
-			fname := "unsplash_" + p.ID + ".jpg"
-			outPath := flatSavePath(destDir, fname, digest)
-			if err := os.WriteFile(outPath, data, 0644); err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-			db.add(digest, outPath)
-			atomic.AddInt64(&stats.New, 1)
-			if prog != nil {
-				prog(1, 0, 0)
-			}
+			tally(fetchPhoto(p, destDir, db, job), &stats, prog, capRemaining)
 		}(photo)
 	}
 	wg.Wait()
@@ -3,9 +3,27 @@ package main
 // zipextract.go — fallback zip extraction used only when the tree API
 // is unavailable or returns a truncated result (repos with >100k files).
 // Normal downloads use downloadRawFiles in github.go instead.
+//
+// Two readers share one entry writer:
+//   - streamZip walks local file headers straight off the HTTP body, so
+//     entries are written while the archive is still downloading.
+//   - extractZipImpl reads a complete archive via its central directory.
+//
+// Both consult the HashDB CRC index (CRC-32 + uncompressed size, as recorded
+// in every zip header) before decompressing, so entries we already own cost
+// nothing but skipping their compressed bytes. New entries are inflated
+// straight to disk while being hashed — never buffered whole in memory.
 
 import (
 	"archive/zip"
+	"bytes"
+	"compress/flate"
+	"crypto/md5"
+	"encoding/binary"
+	"encoding/hex"
+	"errors"
+	"fmt"
+	"hash/crc32"
 	"io"
 	"os"
 	"path/filepath"
@@ -14,6 +32,236 @@ import (
 	"sync/atomic"
 )
 
+const (
+	zipSigLocal     = 0x04034b50
+	zipSigCentral   = 0x02014b50
+	zipSigEnd       = 0x06054b50
+	zipFlagDataDesc = 0x8
+	zipStreamBufMax = 64 << 20 // larger entries are inflated inline, not handed to a worker
+	zip64ExtraID    = 0x0001
+	zipSizeSentinel = 0xffffffff
+)
+
+// errZipNotStreamable means the archive can't be processed sequentially
+// (e.g. an entry whose sizes live in a trailing data descriptor).
+var errZipNotStreamable = errors.New("zip: entry not streamable")
+
+// zipEntryFilter returns the image filter shared by both readers:
+// only images under <repo>-<branch>/<subdir>/ when subdir is set.
+func zipEntryFilter(repo, branch, subdir string) func(name string) bool {
+	zipPfx := strings.ToLower(repo + "-" + branch + "/")
+	subPfx := ""
+	if subdir != "" {
+		subPfx = zipPfx + strings.ToLower(subdir) + "/"
+	}
+	return func(name string) bool {
+		if strings.HasSuffix(name, "/") || !isImage(name) {
+			return false
+		}
+		return subPfx == "" || strings.HasPrefix(strings.ToLower(name), subPfx)
+	}
+}
+
+// writeZipEntry inflates r into destDir, hashing as it writes. The result is
+// a dupe if the MD5 is already known; otherwise the file is renamed into place
+// and recorded in both the hash and CRC indexes.
+func writeZipEntry(r io.Reader, name, destDir string, crc uint32, size uint64,
+	db *HashDB) photoResult {
+
+	tmp, err := os.CreateTemp(destDir, ".wallpimp-*.part")
+	if err != nil {
+		return photoErr
+	}
+	h := md5.New()
+	c := crc32.NewIEEE()
+	n, err := io.Copy(io.MultiWriter(tmp, h, c), r)
+	if err == nil {
+		err = tmp.Chmod(0644) // CreateTemp makes it owner-only
+	}
+	tmp.Close()
+	if err != nil || uint64(n) != size || c.Sum32() != crc {
+		os.Remove(tmp.Name())
+		return photoErr
+	}
+
+	digest := hex.EncodeToString(h.Sum(nil))
+	if db.has(digest) {
+		os.Remove(tmp.Name())
+		db.addCRC(crc, size, digest)
+		return photoDupe
+	}
+	outPath := db.savePath(destDir, filepath.Base(name), digest)
+	if err := os.Rename(tmp.Name(), outPath); err != nil {
+		os.Remove(tmp.Name())
+		return photoErr
+	}
+	db.link(destDir, filepath.Base(name), digest, outPath)
+	db.add(digest, outPath)
+	db.addCRC(crc, size, digest)
+	return photoNew
+}
+
+// ── Streaming reader ──────────────────────────────────────────────────────────
+
+type zipLocalHeader struct {
+	flags, method uint16
+	crc           uint32
+	csize, usize  uint64
+	name          string
+}
+
+// readZipLocalHeader reads the next local file header. done is true once the
+// central directory (or end record) is reached.
+func readZipLocalHeader(r io.Reader) (h zipLocalHeader, done bool, err error) {
+	var sig [4]byte
+	if _, err = io.ReadFull(r, sig[:]); err != nil {
+		return h, false, err
+	}
+	switch binary.LittleEndian.Uint32(sig[:]) {
+	case zipSigLocal:
+	case zipSigCentral, zipSigEnd:
+		return h, true, nil
+	default:
+		return h, false, errZipNotStreamable
+	}
+	var b [26]byte
+	if _, err = io.ReadFull(r, b[:]); err != nil {
+		return h, false, err
+	}
+	le := binary.LittleEndian
+	h.flags = le.Uint16(b[2:])
+	h.method = le.Uint16(b[4:])
+	h.crc = le.Uint32(b[10:])
+	h.csize = uint64(le.Uint32(b[14:]))
+	h.usize = uint64(le.Uint32(b[18:]))
+	nameExtra := make([]byte, int(le.Uint16(b[22:]))+int(le.Uint16(b[24:])))
+	if _, err = io.ReadFull(r, nameExtra); err != nil {
+		return h, false, err
+	}
+	nlen := int(le.Uint16(b[22:]))
+	h.name = string(nameExtra[:nlen])
+
+	// Zip64: real sizes live in extra field 0x0001, in usize, csize order.
+	if h.usize == zipSizeSentinel || h.csize == zipSizeSentinel {
+		extra := nameExtra[nlen:]
+		for len(extra) >= 4 {
+			id, sz := le.Uint16(extra), int(le.Uint16(extra[2:]))
+			if len(extra) < 4+sz {
+				break
+			}
+			if id == zip64ExtraID {
+				f := extra[4 : 4+sz]
+				if h.usize == zipSizeSentinel && len(f) >= 8 {
+					h.usize, f = le.Uint64(f), f[8:]
+				}
+				if h.csize == zipSizeSentinel && len(f) >= 8 {
+					h.csize = le.Uint64(f)
+				}
+			}
+			extra = extra[4+sz:]
+		}
+	}
+	if h.flags&zipFlagDataDesc != 0 {
+		return h, false, errZipNotStreamable
+	}
+	return h, false, nil
+}
+
+// streamZip processes a zip archive sequentially from r. Known entries are
+// skipped by CRC without inflating; new ones are handed to a pool of workers.
+// A non-nil error means processing stopped early and the caller should fall
+// back to the full archive (everything saved so far is in the CRC index).
+func streamZip(r io.Reader, repo, branch, subdir, destDir string,
+	workers int, db *HashDB, prog progressFn,
+	capRemaining *int64) (stats DownloadStats, err error) {
+
+	if err := os.MkdirAll(destDir, 0755); err != nil {
+		return DownloadStats{Errors: 1}, nil
+	}
+	if workers <= 0 {
+		workers = 8
+	}
+	want := zipEntryFilter(repo, branch, subdir)
+	sem := make(chan struct{}, workers)
+	var wg sync.WaitGroup
+	// Named results: the deferred Wait runs before the caller sees stats.
+	defer wg.Wait()
+
+	for {
+		if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
+			return stats, nil
+		}
+		h, done, err := readZipLocalHeader(r)
+		if done {
+			return stats, nil
+		}
+		if err != nil {
+			return stats, fmt.Errorf("zip stream: %w", err)
+		}
+		body := io.LimitReader(r, int64(h.csize))
+
+		if !want(h.name) || db.hasCRC(h.crc, h.usize) {
+			if want(h.name) {
+				tally(photoDupe, &stats, prog, nil)
+			}
+			if _, err := io.Copy(io.Discard, body); err != nil {
+				return stats, fmt.Errorf("zip stream: %w", err)
+			}
+			continue
+		}
+		if h.method != zip.Store && h.method != zip.Deflate {
+			tally(photoErr, &stats, prog, nil)
+			if _, err := io.Copy(io.Discard, body); err != nil {
+				return stats, fmt.Errorf("zip stream: %w", err)
+			}
+			continue
+		}
+
+		// Inline for huge entries; otherwise buffer the (compressed) bytes so
+		// inflate + hash + write overlap with reading the next entry.
+		if h.csize > zipStreamBufMax {
+			src := body
+			var fr io.ReadCloser
+			if h.method == zip.Deflate {
+				fr = flate.NewReader(body)
+				src = fr
+			}
+			res := writeZipEntry(src, h.name, destDir, h.crc, h.usize, db)
+			if fr != nil {
+				fr.Close()
+			}
+			if _, err := io.Copy(io.Discard, body); err != nil {
+				return stats, fmt.Errorf("zip stream: %w", err)
+			}
+			tally(res, &stats, prog, capRemaining)
+			continue
+		}
+		comp := make([]byte, h.csize)
+		if _, err := io.ReadFull(body, comp); err != nil {
+			return stats, fmt.Errorf("zip stream: %w", err)
+		}
+		sem <- struct{}{}
+		wg.Add(1)
+		go func(h zipLocalHeader, comp []byte) {
+			defer wg.Done()
+			defer func() { <-sem }()
+			if capRemaining != nil && atomic.LoadInt64(capRemaining) <= 0 {
+				return
+			}
+			var src io.Reader = bytes.NewReader(comp)
+			if h.method == zip.Deflate {
+				fr := flate.NewReader(src)
+				defer fr.Close()
+				src = fr
+			}
+			tally(writeZipEntry(src, h.name, destDir, h.crc, h.usize, db),
+				&stats, prog, capRemaining)
+		}(h, comp)
+	}
+}
+
+// ── Random-access reader ──────────────────────────────────────────────────────
+
 func extractZipImpl(zipPath, repo, branch, subdir, destDir string,
 	workers int, db *HashDB, prog progressFn,
 	capRemaining *int64) DownloadStats {
@@ -28,25 +276,21 @@ func extractZipImpl(zipPath, repo, branch, subdir, destDir string,
 		return DownloadStats{Errors: 1}
 	}
 
-	zipPfx := strings.ToLower(repo + "-" + branch + "/")
-	subPfx := ""
-	if subdir != "" {
-		subPfx = zipPfx + strings.ToLower(subdir) + "/"
-	}
-
+	want := zipEntryFilter(repo, branch, subdir)
+	var stats DownloadStats
 	var imgs []*zip.File
 	for _, f := range zr.File {
-		if f.FileInfo().IsDir() || !isImage(f.Name) {
+		if f.FileInfo().IsDir() || !want(f.Name) {
 			continue
 		}
-		lower := strings.ToLower(f.Name)
-		if subPfx != "" && !strings.HasPrefix(lower, subPfx) {
+		// Central directory pre-filter: known (CRC, size) → dupe, no inflate.
+		if db.hasCRC(f.CRC32, f.UncompressedSize64) {
+			tally(photoDupe, &stats, prog, nil)
 			continue
 		}
 		imgs = append(imgs, f)
 	}
 
-	var stats DownloadStats
 	sem := make(chan struct{}, workers)
 	var wg sync.WaitGroup
 
@@ -66,49 +310,12 @@ func extractZipImpl(zipPath, repo, branch, subdir, destDir string,
 
 			rc, err := f.Open()
 			if err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
+				tally(photoErr, &stats, prog, nil)
 				return
 			}
-			data, err := io.ReadAll(rc)
+			res := writeZipEntry(rc, f.Name, destDir, f.CRC32, f.UncompressedSize64, db)
 			rc.Close()
-			if err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-
-			digest := md5hex(data)
-			if db.has(digest) {
-				atomic.AddInt64(&stats.Dupes, 1)
-				if prog != nil {
-					prog(0, 1, 0)
-				}
-				return
-			}
-
-			fname := filepath.Base(f.Name)
-			outPath := flatSavePath(destDir, fname, digest)
-			if err := os.WriteFile(outPath, data, 0644); err != nil {
-				atomic.AddInt64(&stats.Errors, 1)
-				if prog != nil {
-					prog(0, 0, 1)
-				}
-				return
-			}
-
-			db.add(digest, outPath)
-			atomic.AddInt64(&stats.New, 1)
-			if capRemaining != nil {
-				atomic.AddInt64(capRemaining, -1)
-			}
-			if prog != nil {
-				prog(1, 0, 0)
-			}
+			tally(res, &stats, prog, capRemaining)
 		}(zf)
 	}
 	wg.Wait()
@@ -0,0 +1,21 @@
+import sys
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+from pathlib import Path
+
+import pytest
+
+_CLI = Path(__file__).resolve().parent.parent / "wallpimp"
+
+
+@pytest.fixture
+def wp(tmp_path, monkeypatch):
+    """The CLI loaded as "wallpimp_cli" without registering it in sys.modules,
+    with its config and hash DB under a throwaway HOME."""
+    for k in ("HOME", "USERPROFILE", "APPDATA"): monkeypatch.setenv(k, str(tmp_path / "home"))
+    loader = SourceFileLoader("wallpimp_cli", str(_CLI))
+    mod = module_from_spec(spec_from_loader("wallpimp_cli", loader))
+    loader.exec_module(mod)
+    assert "wallpimp_cli" not in sys.modules
+    monkeypatch.setattr(mod, "screen_resolution", lambda: (640, 360))
+    return mod
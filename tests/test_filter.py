@@ -0,0 +1,52 @@
+# Slideshow filter tests — FeatureIndex over generated images, and the
+# dark / light / colour weighting built on it.
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("numpy")
+
+_COLOURS = {"dark": (8, 8, 12), "light": (240, 240, 240), "red": (230, 40, 40)}
+
+
+@pytest.fixture
+def walls(tmp_path):
+    d = tmp_path / "walls"; d.mkdir()
+    out = []
+    for name, rgb in _COLOURS.items():
+        p = d / f"{name}.png"; Image.new("RGB", (320, 180), rgb).save(p); out.append(p)
+    bad = d / "broken.jpg"; bad.write_bytes(b"\xff\xd8 not really"); out.append(bad)
+    return out
+
+
+def test_index_update(wp, walls):
+    index = wp.FeatureIndex()
+    assert index.needs_update(walls)
+    assert index.update(walls) == 4
+    assert not index.needs_update(walls)
+    assert index.data[str(walls[-1])].get("bad")      # undecodable: recorded, not retried
+    assert index.data[str(walls[0])]["lum"] < 0.1
+
+    again = wp.FeatureIndex()                           # persisted to features.json
+    assert not again.needs_update(walls) and again.update(walls) == 0
+
+    Image.new("RGB", (640, 360), (20, 20, 20)).save(walls[0])
+    assert again.needs_update(walls)
+    assert again.update(walls[:2], prune=True) == 1
+    assert set(again.data) == {str(p) for p in walls[:2]}
+
+
+@pytest.mark.parametrize("spec, best", [("dark", "dark"), ("light", "light"), ("colour:red", "red"),
+                                        ("color:#e62828", "red")])
+def test_weigh_wallpapers(wp, walls, spec, best):
+    index = wp.FeatureIndex(); index.update(walls)
+    kept, weights = wp.weigh_wallpapers(walls, index, spec)
+    assert weights is not None and len(kept) == len(weights)
+    assert kept[int(weights.argmax())].stem == best
+    assert all(p.stem != "broken" for p in kept)
+
+
+@pytest.mark.parametrize("spec", ["", "colour:#zz", "sepia"])
+def test_weigh_wallpapers_no_filter(wp, walls, spec):
+    index = wp.FeatureIndex(); index.update(walls)
+    assert wp.weigh_wallpapers(walls, index, spec) == (walls, None)
@@ -0,0 +1,42 @@
+# Library import tests — hashing on both sides of the mmap threshold, dedup
+# against the hash DB, and the import_index.json shortcut on re-import.
+
+import hashlib, json, os
+from pathlib import Path
+
+
+def _md5(p): return hashlib.md5(Path(p).read_bytes()).hexdigest()
+
+
+def test_import_library(wp, tmp_path, monkeypatch):
+    lib = tmp_path / "library"; (lib / "sub").mkdir(parents=True)
+    big = lib / "big.jpg"; big.write_bytes(os.urandom(wp._MMAP_MIN + 12345))      # mmap'd
+    small = lib / "small.png"; small.write_bytes(os.urandom(2048))                 # one read
+    dup = lib / "sub" / "copy.png"; dup.write_bytes(small.read_bytes())
+    (lib / "empty.jpg").touch(); (lib / "notes.txt").write_text("not an image")
+
+    walls = tmp_path / "walls"; walls.mkdir()                                      # already downloaded
+    have = walls / "have.webp"; have.write_bytes(os.urandom(4096))
+    again = lib / "again.webp"; again.write_bytes(have.read_bytes())
+    wp.save_hashes({_md5(have): str(have)})
+
+    st = wp.import_library(lib, workers=4)
+    assert {k: st[k] for k in ("files", "new", "dupes", "cached", "errors")} == \
+        {"files": 4, "new": 2, "dupes": 2, "cached": 0, "errors": 0}
+    db = wp.load_hashes()
+    assert db[_md5(big)] == str(big)
+    assert db[_md5(small)] in (str(small), str(dup))
+    assert db[_md5(have)] == str(have)                                             # not re-pointed
+    idx = json.loads(Path(wp._IMPORT_IDX).read_text())
+    assert idx[str(big)][2] == _md5(big) and len(idx) == 4
+
+    def no_rehash(*_): raise AssertionError("unchanged file hashed again")
+    with monkeypatch.context() as m:
+        m.setattr(wp, "_md5_file", no_rehash)
+        st = wp.import_library(lib)
+    assert (st["cached"], st["new"], st["dupes"]) == (4, 0, 2)
+
+    small.write_bytes(os.urandom(3000))                                            # changed: size differs
+    st = wp.import_library(lib)
+    assert (st["cached"], st["new"]) == (3, 1)
+    assert wp.load_hashes()[_md5(small)] == str(small)
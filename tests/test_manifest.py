@@ -0,0 +1,50 @@
+# Batch manifest tests — page specs and entry normalisation (no engine needed).
+
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("spec, want", [
+    (None, (1, 0)), ("", (1, 0)), (3, (3, 3)), ("3", (3, 3)), ("1-3", (1, 3)),
+    (" 2 - ", (2, 0)), ("-4", (1, 4)), ([1, 3], (1, 3)), ([2], (2, 0)), ([2, None], (2, 0)),
+])
+def test_parse_pages(wp, spec, want):
+    assert wp._parse_pages(spec) == want
+
+
+@pytest.mark.parametrize("spec", ["abc", "1-x", "3-1", 0, "0-2", [], ["a"], {"from": 1}, True])
+def test_parse_pages_rejects(wp, spec):
+    with pytest.raises(ValueError, match="bad pages"):
+        wp._parse_pages(spec)
+
+
+def _manifest(tmp_path, body):
+    p = tmp_path / "manifest.json"; p.write_text(json.dumps(body)); return p
+
+
+def test_load_manifest(wp, tmp_path):
+    dest, entries = wp.load_manifest(_manifest(tmp_path, {"dest": "/walls", "entries": [
+        {"search": "fjord", "pages": "1-2", "max": "40"},
+        {"topic": "nature", "dest": "~/n"},
+        {"kind": "collection", "col_id": "123", "pages": [2, None]},
+    ]}))
+    assert dest == "/walls"
+    assert entries[0] == {"kind": "search", "query": "fjord", "from": 1, "to": 2, "max": 40}
+    assert entries[1]["kind"] == "topic" and not entries[1]["dest"].startswith("~")
+    assert (entries[2]["from"], entries[2]["to"]) == (2, 0)
+
+
+@pytest.mark.parametrize("body, msg", [
+    ([{"search": "a"}, "search"], r"entry 2: expected an object"),
+    ([{"search": "a"}, 7], r"entry 2: expected an object"),
+    ([{"topic": "a", "pages": "x"}], r"entry 1: bad pages"),
+    ([{"topic": "a", "max": "lots"}], r"entry 1: "),
+    ([{"query": "a"}], r"entry 1: needs one of"),
+    ({"entries": "search"}, r"list of entries"),
+    (42, r"list of entries"),
+    ([], r"no entries"),
+])
+def test_load_manifest_rejects(wp, tmp_path, body, msg):
+    with pytest.raises(ValueError, match=msg):
+        wp.load_manifest(_manifest(tmp_path, body))
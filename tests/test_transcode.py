@@ -0,0 +1,40 @@
+# Transcode tests — EXIF-rotated input, and the process pool when the CLI is loaded
+# the way the GUI and the Python engine load it (SourceFileLoader, another name).
+
+import json
+from pathlib import Path
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _noise(path, size, **save):
+    Image.effect_noise(size, 60).convert("RGB").save(path, **save)
+
+
+def test_rotated_jpeg_keeps_displayed_aspect(wp, tmp_path):
+    src = tmp_path / "rotated.jpg"
+    exif = Image.Exif(); exif[0x0112] = 6              # stored landscape, displayed portrait
+    _noise(src, (3000, 1500), quality=95, exif=exif.tobytes())
+    new, before, after = wp._transcode_one(str(src), "0" * 32, (960, 540), "webp", 85)
+    assert new and after < before
+    with Image.open(new) as out:
+        assert out.size == (960, 1920)
+
+
+def test_library_from_unregistered_module(wp, tmp_path):
+    wdir = tmp_path / "walls"; wdir.mkdir()
+    db = {}
+    for i in range(3):
+        p = wdir / f"big{i}.png"; _noise(p, (1600, 900)); db["%032x" % i] = str(p)
+    bad = wdir / "broken.png"; bad.write_bytes(b"\x89PNG not really")
+    db["f" * 32] = str(bad)
+    wp.save_hashes(db)
+    cfg = dict(wp.load_config(), wallpaper_dir=str(wdir))
+
+    st = wp.transcode_library(cfg)
+    assert (st["done"], st["failed"]) == (3, 1)
+    ledger = json.loads(Path(wp._TRANSCODE_DB).read_text())
+    assert "f" * 32 not in ledger                      # failures are retried, not recorded as kept
+    assert all(ledger["%032x" % i]["path"].endswith(".webp") for i in range(3))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# wallpimp_bench – headless benchmarks for the Python hot paths
+# Developer : 0xb0rn3  |  oxbv1@proton.me  |  github.com/0xb0rn3/wallpimp
+#
+# Generates a synthetic wallpaper library, then times the code the CLI and GUI
+# spend their time in:
+#
+#   all_wallpapers   wallpimp._all_wallpapers  (slideshow / random library walk)
+#   preview_load_bg  PreviewPanel._load_bg     (GUI thumbnail decode, no Tk)
+#   load_hashes      wallpimp.load_hashes      (hashes.json parse)
+#   cleanup_hashes   wallpimp.cleanup_hashes   (stat every entry, rewrite DB)
+#   set_wallpaper    wallpimp.set_wallpaper    (DE dispatch; setters stubbed)
+#
+# Everything runs against a throwaway HOME, so the real config and hash DB are
+# never touched. Results go to stdout (or --out) as JSON; a summary to stderr.
+#
+#   python3 wallpimp_bench.py --files 2000 --hashes 50000 --out bench.json
+
+import argparse, json, os, platform, random, shutil, statistics, subprocess
+import sys, tempfile, time
+from pathlib import Path
+
+_HERE = Path(__file__).resolve().parent
+_BENCHES = ("all_wallpapers", "preview_load_bg", "load_hashes", "cleanup_hashes", "set_wallpaper")
+
+# ── corpus ────────────────────────────────────────────────────────────────────
+def _dims(spec):
+    w, h = spec.lower().split("x"); return int(w), int(h)
+
+def _fake_image(w, h, seed):
+    """Gradient plus noise, so encoders do roughly the work a photo costs."""
+    from PIL import Image, ImageChops
+    rnd = random.Random(seed)
+    base = Image.linear_gradient("L").resize((w, h)).rotate(rnd.randrange(360), expand=False)
+    tint = tuple(rnd.randrange(256) for _ in range(3))
+    img = Image.merge("RGB", [base.point(lambda v, t=t: (v + t) & 255) for t in tint])
+    noise = Image.effect_noise((w, h), 40).convert("RGB")
+    return ImageChops.add(img, noise, scale=2)
+
+def make_corpus(root, files, sizes, formats, depth, fanout=4, junk=0.1, seed=1):
+    """files images spread over a depth-level tree (fanout dirs per level),
+    plus ~junk × files non-image files the library walk has to skip.
+    Returns the image paths."""
+    root = Path(root); rnd = random.Random(seed)
+    dirs = [root]
+    for _ in range(depth):
+        dirs = [d / f"d{i}" for d in dirs for i in range(fanout)]
+    for d in dirs: d.mkdir(parents=True, exist_ok=True)
+    out = []; cache = {}
+    for i in range(files):
+        w, h = sizes[i % len(sizes)]; fmt = formats[i % len(formats)]
+        key = (w, h, fmt, i % 4)   # 4 variants per size/format keep generation quick
+        if key not in cache:
+            tmp = root / f".seed{len(cache)}.{fmt}"
+            _fake_image(w, h, seed + len(cache)).save(tmp, "JPEG" if fmt in ("jpg", "jpeg") else fmt.upper())
+            cache[key] = tmp
+        dst = rnd.choice(dirs) / f"wall_{i:06d}.{fmt}"
+        shutil.copyfile(cache[key], dst); out.append(dst)
+    for i in range(int(files * junk)):
+        (rnd.choice(dirs) / f"notes_{i:05d}.txt").write_text("x")
+    for tmp in cache.values(): tmp.unlink()
+    return out
+
+def make_hash_db(images, entries, missing, seed=1):
+    """entries synthetic md5 → path rows; a missing fraction point at files
+    that don't exist (what cleanup_hashes removes), the rest at real images."""
+    rnd = random.Random(seed); db = {}
+    gone = images[0].parent if images else Path("/nonexistent")
+    for i in range(entries):
+        h = "%032x" % rnd.getrandbits(128)
+        db[h] = str(gone / f"deleted_{i}.jpg") if rnd.random() < missing or not images else str(rnd.choice(images))
+    return db
+
+# ── timing ────────────────────────────────────────────────────────────────────
+def _time(fn, repeat, setup=None, warmup=1):
+    runs = []
+    for i in range(warmup + repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter(); fn(arg) if setup else fn(); dt = time.perf_counter() - t0
+        if i >= warmup: runs.append(dt)
+    return runs
+
+def _result(runs, items):
+    med = statistics.median(runs)
+    return {"items": items, "runs": [round(r, 6) for r in runs],
+            "min": round(min(runs), 6), "median": round(med, 6), "mean": round(statistics.fmean(runs), 6),
+            "per_item_us": round(med / items * 1e6, 3) if items else None}
+
+# ── benchmarks ────────────────────────────────────────────────────────────────
+class _Stub:
+    """Stands in for the Tk widgets PreviewPanel._load_bg touches."""
+    def after(self, _ms, fn, *args): self.last = (fn, args)
+    def set(self, _v): pass
+
+def bench_all_wallpapers(wp, g, env, repeat):
+    n = len(wp._all_wallpapers(env["wdir"]))
+    return _result(_time(lambda: wp._all_wallpapers(env["wdir"]), repeat), n)
+
+def bench_preview_load_bg(wp, g, env, repeat):
+    if not g.HAS_PIL: return {"skipped": "Pillow not installed"}
+    panel = object.__new__(g.PreviewPanel)
+    panel.wdir = str(env["wdir"]); panel.parent = _Stub(); panel._loading_var = _Stub()
+    runs = _time(panel._load_bg, repeat)
+    return _result(runs, len(panel.parent.last[1][0]))
+
+def bench_load_hashes(wp, g, env, repeat):
+    wp.save_hashes(env["db"])
+    return _result(_time(wp.load_hashes, repeat), len(env["db"]))
+
+def bench_cleanup_hashes(wp, g, env, repeat):
+    return _result(_time(wp.cleanup_hashes, repeat, setup=lambda: dict(env["db"])), len(env["db"]))
+
+def bench_set_wallpaper(wp, g, env, repeat):
+    """Dispatch overhead per call for each desktop path, setters stubbed."""
+    calls = [0]
+    def stub(*_a, **_k): calls[0] += 1; return True
+    saved = {k: getattr(wp, k) for k in ("set_wallpaper_windows", "set_wallpaper_macos", "set_wallpaper_gnome",
+                                         "set_wallpaper_xfce", "desktop_bus", "_OS")}
+    saved_env = {k: os.environ.get(k) for k in ("XDG_CURRENT_DESKTOP", "DESKTOP_SESSION")}
+    for k in saved:
+        if k.startswith("set_"): setattr(wp, k, stub)
+    wp.desktop_bus = lambda: None
+    wall = str(env["images"][0]); renders = {"*": wall, "DP-1": wall}
+    out = {}; n = 2000
+    try:
+        for label, os_, de in (("gnome", "linux", "GNOME"), ("xfce", "linux", "XFCE"),
+                               ("unknown", "linux", ""), ("windows", "windows", ""), ("macos", "macos", "")):
+            wp._OS = os_; os.environ["XDG_CURRENT_DESKTOP"] = de; os.environ.pop("DESKTOP_SESSION", None)
+            out[label] = _result(_time(lambda: [wp.set_wallpaper(wall, renders) for _ in range(n)], repeat), n)
+    finally:
+        for k, v in saved.items(): setattr(wp, k, v)
+        for k, v in saved_env.items():
+            if v is None: os.environ.pop(k, None)
+            else: os.environ[k] = v
+    out["setter_calls"] = calls[0]
+    return out
+
+# ── main ──────────────────────────────────────────────────────────────────────
+def _load_modules(home):
+    """Import the CLI and GUI modules with HOME pointed at the sandbox."""
+    for k in ("HOME", "USERPROFILE", "APPDATA"): os.environ[k] = str(home)
+    os.environ.pop("DISPLAY", None); os.environ.pop("WAYLAND_DISPLAY", None)
+    sys.path.insert(0, str(_HERE))
+    import wallpimp_gui as g   # loads ./wallpimp as g.wp
+    if g.wp is None: sys.exit("wallpimp_bench: could not load ./wallpimp")
+    return g.wp, g
+
+def _meta(args):
+    try: rev = subprocess.run(["git", "-C", str(_HERE), "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError): rev = ""
+    try: import PIL; pil = PIL.__version__
+    except ImportError: pil = None
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": rev,
+            "python": platform.python_version(), "platform": platform.platform(), "pillow": pil,
+            "corpus": {"files": args.files, "sizes": args.sizes, "formats": args.formats,
+                       "depth": args.depth, "hashes": args.hashes, "missing": args.missing},
+            "repeat": args.repeat}
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark wallpimp's Python hot paths on a synthetic library.")
+    ap.add_argument("--files", type=int, default=500, help="images in the corpus (default 500)")
+    ap.add_argument("--sizes", default="1280x720,1920x1080", help="comma-separated WxH list")
+    ap.add_argument("--formats", default="jpg,png,webp", help="comma-separated: jpg png webp bmp")
+    ap.add_argument("--depth", type=int, default=2, help="directory levels under the library root")
+    ap.add_argument("--hashes", type=int, default=20000, help="hash DB entries")
+    ap.add_argument("--missing", type=float, default=0.1, help="fraction of DB entries whose file is gone")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (after one warm-up)")
+    ap.add_argument("--only", default="", help="comma-separated subset of: " + ", ".join(_BENCHES))
+    ap.add_argument("--corpus", help="keep/reuse the corpus in this directory instead of a temp one")
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    only = [b.strip() for b in args.only.split(",") if b.strip()] or list(_BENCHES)
+    bad = set(only) - set(_BENCHES)
+    if bad: ap.error(f"unknown benchmark(s): {', '.join(sorted(bad))}")
+    try: import PIL  # noqa: F401
+    except ImportError: sys.exit("wallpimp_bench: the corpus generator needs Pillow (pip install pillow)")
+
+    tmp = Path(tempfile.mkdtemp(prefix="wallpimp-bench-"))
+    try:
+        wp, g = _load_modules(tmp / "home")
+        wdir = Path(args.corpus).expanduser() if args.corpus else tmp / "walls"
+        images = [p for p in wdir.rglob("wall_*")] if args.corpus and wdir.is_dir() else []
+        if not images:
+            print(f"[bench] generating {args.files} images in {wdir} \u2026", file=sys.stderr)
+            t0 = time.perf_counter()
+            images = make_corpus(wdir, args.files, [_dims(s) for s in args.sizes.split(",")],
+                                 [f.strip().lower() for f in args.formats.split(",")], args.depth)
+            print(f"[bench] corpus ready in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        env = {"wdir": wdir, "images": images, "db": make_hash_db(images, args.hashes, args.missing)}
+
+        results = {}
+        for name in only:
+            print(f"[bench] {name} \u2026", file=sys.stderr, end="", flush=True)
+            r = results[name] = globals()["bench_" + name](wp, g, env, args.repeat)
+            med = r.get("median") or min((v["median"] for v in r.values() if isinstance(v, dict) and "median" in v),
+                                        default=None)
+            print(f" {med * 1e3:.2f} ms" if med is not None else f" {r.get('skipped', '')}", file=sys.stderr)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    doc = json.dumps({"meta": _meta(args), "results": results}, indent=2)
+    if args.out: Path(args.out).write_text(doc + "\n")
+    else: print(doc)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,733 @@
+#!/usr/bin/env python3
+# wallpimp_engine – pure-Python fallback for the Go wallpimp-engine
+# Developer : 0xb0rn3  |  oxbv1@proton.me  |  github.com/0xb0rn3/wallpimp
+#
+# Used automatically by the CLI and GUI when the wallpimp-engine binary isn't
+# available. Same command line, same JSON-lines protocol, same hash database
+# files (hashes.json + .crc.json + .src.json), so the two are interchangeable:
+#
+#   python3 wallpimp_engine.py <hash_db_path> <workers>
+#
+# The first stdout line is the address to connect to (a Unix socket path, or
+# "tcp:<port>" on Windows). Every command except the quick control ones runs
+# as its own task, and its events carry the command's "job" tag.
+#
+# asyncio drives the pipelines. HTTP goes through one pooled keep-alive
+# requests.Session on a thread pool; concurrency is bounded by semaphores
+# (workers images, 16 repos, 4 topics). Bodies are streamed to a temp file in
+# the destination while being hashed, then renamed into place — never held
+# whole in memory. Bandwidth limits and priority classes follow throttle.go.
+# One difference from the Go engine: the zip fallback downloads the whole
+# archive before extracting it, where streamZip extracts while it downloads.
+
+import asyncio, hashlib, json, math, os, random, re, signal, sys, tempfile, threading, time, zipfile, zlib
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# ── Shared backend ────────────────────────────────────────────────────────────
+# Repo list, credentials, image extensions and resolution detection live in the
+# CLI script; load it as a module like the GUI does.
+def _load_backend():
+    from importlib.machinery import SourceFileLoader
+    from importlib.util import module_from_spec, spec_from_loader
+    loader = SourceFileLoader("wallpimp_cli", str(Path(__file__).resolve().parent / "wallpimp"))
+    mod = module_from_spec(spec_from_loader("wallpimp_cli", loader))
+    sys.modules["wallpimp_cli"] = mod   # so its process pools can pickle its functions
+    loader.exec_module(mod); return mod
+
+wp = _load_backend()
+import requests
+from requests.adapters import HTTPAdapter
+
+_UA = "WallPimp/2.0 (github.com/0xb0rn3/wallpimp)"
+# Rotating User-Agents reduce the chance GitHub fingerprints us.
+_GH_UAS = [
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 Version/17.0 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:126.0) Gecko/20100101 Firefox/126.0",
+]
+_CHUNK         = 64 << 10
+_PAGE_SZ       = 30
+_STREAM_RESERVE = 10     # hourly Unsplash calls the slideshow stream leaves free
+_INTERACTIVE   = {"search", "topic_photos", "col_photos", "random"}
+_STORE_DIR     = ".store"
+
+def _is_image(name): return os.path.splitext(name)[1].lower() in wp._IMG_EXTS
+
+# ── Hash database ─────────────────────────────────────────────────────────────
+class HashDB:
+    """Port of hash.go + store.go: md5 → path, the CRC and source sidecars,
+    and the optional sharded layout."""
+    def __init__(self, path):
+        self.path = Path(path); self.mu = threading.Lock(); self.mod = 0
+        self.root = ""; self.store = False
+        self.data = self._read(self.path); self.crc = self._read(self._side("crc")); self.src = self._read(self._side("src"))
+        try: self.mod = self.path.stat().st_mtime_ns
+        except OSError: pass
+
+    def _side(self, kind): return self.path.with_name(self.path.stem + f".{kind}.json")
+
+    @staticmethod
+    def _read(p):
+        try: return json.loads(Path(p).read_text())
+        except (OSError, ValueError): return {}
+
+    def refresh(self):
+        """Merge hashes.json back in if the Python side rewrote it."""
+        try: mod = self.path.stat().st_mtime_ns
+        except OSError: return
+        with self.mu:
+            if mod == self.mod: return
+            self.data.update(self._read(self.path)); self.mod = mod
+
+    def has(self, digest):
+        with self.mu: return digest in self.data
+
+    def has_crc(self, crc, size):
+        with self.mu: return self.crc.get(f"{crc:08x}:{size}") in self.data
+
+    def add(self, digest, path, crc=None, size=None, url=None):
+        with self.mu:
+            self.data[digest] = self.rel(path)
+            if crc is not None: self.crc[f"{crc:08x}:{size}"] = digest
+            if url: self.src[digest] = url
+
+    def forget(self, paths):
+        gone = set(paths)
+        with self.mu:
+            digests = {h for h, p in self.data.items() if p in gone or self.abs(p) in gone}
+            for h in digests: self.data.pop(h, None); self.src.pop(h, None)
+            self.crc = {k: h for k, h in self.crc.items() if h not in digests}
+        return len(digests)
+
+    # ── layout (see store.go) ─────────────────────────────────────────────────
+    def set_layout(self, layout, root):
+        with self.mu:
+            if root: self.root = os.path.normpath(root)
+            self.store = layout == "store" and bool(self.root)
+            return "store" if self.store else "flat"
+
+    def abs(self, p):
+        return p if os.path.isabs(p) or not self.root else os.path.join(self.root, p)
+
+    def rel(self, p):
+        if not self.store: return p
+        r = os.path.relpath(p, self.root)
+        return p if r.startswith("..") else r
+
+    def view_dir(self, wdir, source):
+        return os.path.join(wdir, source) if self.store and source else wdir
+
+    def save_path(self, d, base, digest):
+        if not self.store: return flat_save_path(d, base, digest)
+        p = os.path.join(self.root, _STORE_DIR, digest[:2], digest[2:4], digest + os.path.splitext(base)[1].lower())
+        os.makedirs(os.path.dirname(p), exist_ok=True); return p
+
+    def link(self, d, base, digest, stored):
+        """Add a stored file to the view as d/base; Lstat decides collisions."""
+        if not self.store: return
+        try: os.makedirs(d, exist_ok=True)
+        except OSError: return
+        view = os.path.join(d, base)
+        if os.path.lexists(view):
+            stem, ext = os.path.splitext(base); view = os.path.join(d, f"{stem}_{digest[:8]}{ext}")
+        try: os.link(stored, view)
+        except OSError:
+            try: os.symlink(os.path.relpath(stored, d), view)
+            except OSError: pass
+
+    def save(self):
+        with self.mu:
+            docs = ((self.path, json.dumps(self.data, indent=2)),
+                    (self._side("crc"), json.dumps(self.crc)), (self._side("src"), json.dumps(self.src)))
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            for p, doc in docs:
+                tmp = p.with_suffix(".tmp"); tmp.write_text(doc); os.replace(tmp, p)
+            self.mod = self.path.stat().st_mtime_ns
+
+# ── Bandwidth scheduler (see throttle.go) ─────────────────────────────────────
+class _Bucket:
+    def __init__(self, rate=0.0): self.rate = rate; self.tokens = 0.0; self.last = None; self.mu = threading.Lock()
+
+    def _burst(self): return max(self.rate / 2, _CHUNK)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.last is not None: self.tokens = min(self.tokens + (now - self.last) * self.rate, self._burst())
+        self.last = now
+
+    def set_rate(self, bps):
+        with self.mu: self.rate = bps; self.tokens = min(self.tokens, self._burst())
+
+    def reserve(self, n):
+        """Take n bytes, going into debt if needed; returns seconds to wait."""
+        with self.mu:
+            if self.rate <= 0: return 0.0
+            self._refill(); self.tokens -= n
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_take(self, n):
+        with self.mu:
+            if self.rate <= 0: return True
+            self._refill()
+            if self.tokens < n: return False
+            self.tokens -= n; return True
+
+class Job:
+    def __init__(self, sched, interactive):
+        self.sched = sched; self.interactive = interactive; self.own = _Bucket(); self.cancelled = False
+
+    @contextmanager
+    def transfer(self):
+        """An open body: while an interactive one is open, bulk jobs trickle."""
+        s = self.sched
+        if self.interactive:
+            with s.mu: s.interactive += 1
+        try: yield
+        finally:
+            if self.interactive:
+                with s.mu: s.interactive -= 1
+
+    def charge(self, n):
+        """Block the calling (pool) thread until n bytes may be consumed."""
+        if self.cancelled: raise RuntimeError("job cancelled")
+        s = self.sched
+        while not self.interactive and s.interactive > 0 and not s.trickle.try_take(n) and not self.cancelled:
+            time.sleep(0.025)
+        d = max(self.own.reserve(n), s.glob.reserve(n))
+        if d > 0: time.sleep(d)
+
+class Scheduler:
+    def __init__(self):
+        self.limits = {"global_kbps": 0, "bulk_kbps": 0, "interactive_kbps": 0}
+        self.jobs = set(); self.interactive = 0; self.mu = threading.Lock()   # interactive = open transfers
+        self.glob = _Bucket(); self.trickle = _Bucket(64 << 10)
+
+    def _class_rate(self, interactive):
+        return self.limits["interactive_kbps" if interactive else "bulk_kbps"] * 1024
+
+    def set_limits(self, **kw):
+        self.limits.update({k: int(v) for k, v in kw.items() if v is not None})
+        self.glob.set_rate(self.limits["global_kbps"] * 1024)
+        for j in self.jobs: j.own.set_rate(self._class_rate(j.interactive))
+
+    def start(self, cmd, prio):
+        interactive = prio == "interactive" or (prio != "bulk" and cmd in _INTERACTIVE)
+        j = Job(self, interactive); j.own.set_rate(self._class_rate(interactive))
+        self.jobs.add(j); return j
+
+    def done(self, j): self.jobs.discard(j)
+
+    def cancel_all(self):
+        for j in self.jobs: j.cancelled = True
+
+# ── HTTP (blocking; runs on the pool) ─────────────────────────────────────────
+class Http:
+    def __init__(self, workers):
+        self.s = requests.Session()
+        ad = HTTPAdapter(pool_connections=32, pool_maxsize=max(32, workers * 2))
+        self.s.mount("https://", ad); self.s.mount("http://", ad)
+        self.pool = ThreadPoolExecutor(max_workers=max(16, workers * 2 + 8), thread_name_prefix="http")
+
+    async def run(self, fn, *a):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *a)
+
+    @staticmethod
+    def _retry_after(r):
+        try: return max(0, int(r.headers.get("Retry-After", "")))
+        except ValueError: return 0
+
+    def open(self, url, attempts, headers=None):
+        """GET with retry + backoff (getBytes/openStream); returns the 200
+        response with its body unread, or raises."""
+        last = None
+        for i in range(attempts):
+            if i: time.sleep((1 << i) * (1 + random.random() / 2))
+            try: r = self.s.get(url, headers=headers or {"User-Agent": random.choice(_GH_UAS)}, stream=True, timeout=30)
+            except requests.RequestException as e: last = e; continue
+            if r.status_code == 200: return r
+            r.close()
+            if r.status_code in (429, 403):
+                time.sleep(min(self._retry_after(r) or 30 * (i + 1), 120))
+            elif r.status_code < 500: raise RuntimeError(f"HTTP {r.status_code}")
+            last = RuntimeError(f"HTTP {r.status_code}")
+        raise RuntimeError(f"after {attempts} attempts: {last}")
+
+    def get_json(self, url, attempts=3, headers=None):
+        with self.open(url, attempts, headers) as r: return r.json()
+
+    def head_ok(self, url):
+        try: return self.s.head(url, headers={"User-Agent": random.choice(_GH_UAS)}, timeout=15,
+                                 allow_redirects=True).status_code == 200
+        except requests.RequestException: return False
+
+    def fetch_to(self, url, dest, job, attempts=2, headers=None):
+        """Stream url into a temp file in dest, hashing as it goes.
+        Returns (tmp path, md5, crc32, size)."""
+        with self.open(url, attempts, headers) as r:
+            fd, tmp = tempfile.mkstemp(prefix=".wallpimp-", suffix=".part", dir=dest)
+            h = hashlib.md5(); crc = 0; n = 0
+            try:
+                with os.fdopen(fd, "wb") as f, (job.transfer() if job else nullcontext()):
+                    for chunk in r.iter_content(_CHUNK):
+                        if job: job.charge(len(chunk))
+                        f.write(chunk); h.update(chunk); crc = zlib.crc32(chunk, crc); n += len(chunk)
+            except BaseException:
+                os.unlink(tmp); raise
+        return tmp, h.hexdigest(), crc, n
+
+def flat_save_path(d, base, digest):
+    p = os.path.join(d, base)
+    if not os.path.exists(p): return p
+    try:
+        if wp._md5_file(p, os.path.getsize(p)) == digest: return p
+    except OSError: pass
+    stem, ext = os.path.splitext(base)
+    return os.path.join(d, f"{stem}_{digest[:8]}{ext}")
+
+# ── Ranking (see rank.go) ─────────────────────────────────────────────────────
+# (score, ok): score in (0, 1] of how well an image suits the (w, h) screen, ok
+# when it clears the thresholds. Only capped downloads (and scan) drop !ok.
+_MIN_COVER, _MIN_ASPECT = 0.75, 0.6
+_BYTES_PER_PX, _MIN_SIZE_COVER, _SIZE_ONLY_FIT = 0.15, 0.5, 0.9
+_NAME_DIMS = re.compile(r"(\d{3,5})\s*[x\u00d7X]\s*(\d{3,5})")
+
+def fit(res, w, h):
+    """Coverage of the screen (capped at 1) × share of the image kept by the crop."""
+    sw, sh = res
+    if w <= 0 or h <= 0 or sw <= 0 or sh <= 0: return 0.0, False
+    cover = min(w / sw, h / sh); a, s = w / h, sw / sh
+    aspect = min(a, s) / max(a, s)
+    return min(cover, 1) * aspect, cover >= _MIN_COVER and aspect >= _MIN_ASPECT
+
+def fit_blob(res, path, size):
+    """Repo file: WxH from the name if it has one, else estimated from bytes."""
+    m = _NAME_DIMS.search(os.path.basename(path))
+    if m: return fit(res, int(m[1]), int(m[2]))
+    if not size or res[0] <= 0 or res[1] <= 0: return _SIZE_ONLY_FIT / 2, True
+    cover = math.sqrt(size / (_BYTES_PER_PX * res[0] * res[1]))
+    return min(cover, 1) * _SIZE_ONLY_FIT, cover >= _MIN_SIZE_COVER
+
+def rank_photos(res, photos, strict):
+    """Best first, ones without dimensions last; strict drops unsuitable photos."""
+    keep = []
+    for p in photos:
+        p["score"], ok = fit(res, p["w"], p["h"]) if p.get("w") and p.get("h") else (_SIZE_ONLY_FIT / 2, True)
+        if ok or not strict: keep.append(p)
+    return sorted(keep, key=lambda p: -p["score"])
+
+def rank_images(imgs):
+    """(path, size, score, ...) tuples best first; equal scores prefer the smaller file."""
+    return sorted(imgs, key=lambda i: (-i[2], i[1]))
+
+# ── Progress ──────────────────────────────────────────────────────────────────
+class Progress:
+    """Counters + "progress" events (mkProg); cap is the remaining target."""
+    def __init__(self, emit, cap=None):
+        self.emit = emit; self.new = self.dupes = self.errors = 0
+        self.start = time.monotonic(); self.cap = cap
+
+    @property
+    def full(self): return self.cap is not None and self.cap <= 0
+
+    def tally(self, res, counted=True):
+        if res == "new":
+            self.new += 1
+            if self.cap is not None: self.cap -= 1
+        elif res == "dupe": self.dupes += 1
+        else: self.errors += 1
+        el = time.monotonic() - self.start
+        if counted: self.emit({"event": "progress", "new": self.new, "dupes": self.dupes, "errors": self.errors,
+                               "speed": self.new / el if el > 0 else 0, "elapsed": el})
+
+    def done(self, **kw):
+        self.emit(dict({"event": "done", "new": self.new, "dupes": self.dupes, "errors": self.errors}, **kw))
+
+# ── Engine ────────────────────────────────────────────────────────────────────
+class Engine:
+    def __init__(self, hash_path, workers):
+        self.db = HashDB(hash_path); self.workers = workers
+        self.http = Http(workers); self.bw = Scheduler()
+        w, h = wp.screen_resolution(); self.res = (w, h)
+        tiers = [1280, 1920, 2560, 3840]
+        cw = next((t for t in tiers if t >= w), tiers[-1]); self.dl = (cw, cw * h // w)
+        self.calls = deque(); self.rl_lock = None
+
+    # ── files ─────────────────────────────────────────────────────────────────
+    def _commit(self, fetched, dest, name, url):
+        """Keep a fetched temp file unless its MD5 is known. Runs on the pool."""
+        tmp, digest, crc, size = fetched
+        if self.db.has(digest): os.unlink(tmp); return "dupe"
+        try:
+            out = self.db.save_path(dest, name, digest)
+            os.chmod(tmp, 0o644); os.replace(tmp, out)   # mkstemp makes it owner-only
+        except OSError: os.unlink(tmp); return "err"
+        self.db.link(dest, name, digest, out)
+        self.db.add(digest, out, crc, size, url); return "new"
+
+    def _fetch_file(self, url, dest, name, job, headers=None):
+        try: return self._commit(self.http.fetch_to(url, dest, job, headers=headers), dest, name, url)
+        except (OSError, RuntimeError, requests.RequestException): return "err"
+
+    async def _save_db(self): await self.http.run(self.db.save)
+
+    # ── Unsplash ──────────────────────────────────────────────────────────────
+    async def _rl_wait(self):
+        """Sliding window: 45 API calls per hour (RateLimiter.Wait)."""
+        async with self.rl_lock:
+            now = time.monotonic()
+            while self.calls and self.calls[0] <= now - 3600: self.calls.popleft()
+            if len(self.calls) >= 45:
+                await asyncio.sleep(self.calls[0] + 3601 - now)
+                now = time.monotonic()
+                while self.calls and self.calls[0] <= now - 3600: self.calls.popleft()
+            self.calls.append(time.monotonic())
+
+    def _budget(self, keep):
+        now = time.monotonic(); fresh = [t for t in self.calls if t > now - 3600]
+        allowed = 45 - keep
+        if len(fresh) < allowed: return True, 0
+        return False, fresh[len(fresh) - allowed] + 3600 - now
+
+    async def api(self, endpoint, **params):
+        await self._rl_wait()
+        url = wp._ep() + endpoint + "?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in params.items())
+        return await self.http.run(self.http.get_json, url, 1,
+                                   {"Authorization": "Client-ID " + wp._r(), "Accept-Version": "v1", "User-Agent": _UA})
+
+    def _photos(self, arr):
+        w, h = self.dl
+        return [{"id": p["id"], "url": p["urls"]["raw"] + f"&w={w}&h={h}&fit=crop&fm=jpg&q=85",
+                 "w": p.get("width") or 0, "h": p.get("height") or 0}
+                for p in arr if p.get("id") and p.get("urls", {}).get("raw")]
+
+    async def u_random(self, n):
+        body = await self.api("/photos/random", orientation="landscape", count=min(max(n, 1), 30))
+        return self._photos(body if isinstance(body, list) else [body])
+
+    async def u_search(self, q, page):
+        body = await self.api("/search/photos", query=q, orientation="landscape", per_page=_PAGE_SZ, page=page or 1)
+        return self._photos(body.get("results", []))
+
+    async def u_topics(self):
+        return [{"slug": t.get("slug", ""), "title": t.get("title", ""), "total_photos": t.get("total_photos", 0)}
+                for t in await self.api("/topics", per_page=20, order_by="featured")]
+
+    async def u_topic_photos(self, slug, page):
+        return self._photos(await self.api(f"/topics/{slug}/photos", orientation="landscape", per_page=_PAGE_SZ, page=page or 1))
+
+    async def u_collections(self, page):
+        return [{"id": c.get("id", ""), "title": c.get("title", ""), "total_photos": c.get("total_photos", 0)}
+                for c in await self.api("/collections", per_page=20, page=page or 1)]
+
+    async def u_col_photos(self, cid, page):
+        return self._photos(await self.api(f"/collections/{cid}/photos", orientation="landscape", per_page=_PAGE_SZ, page=page or 1))
+
+    async def download_photos(self, photos, dest, prog, job, workers=None):
+        try: os.makedirs(dest, exist_ok=True)
+        except OSError:
+            for _ in photos: prog.tally("err")
+            return
+        sem = asyncio.Semaphore(workers or self.workers)
+        async def one(p):
+            async with sem:
+                if prog.full: return
+                prog.tally(await self.http.run(self._fetch_file, p["url"], dest, f"unsplash_{p['id']}.jpg", job,
+                                               {"User-Agent": _UA}))
+        await asyncio.gather(*(one(p) for p in photos))
+
+    async def download_topics(self, topics, wdir, prog, job):
+        """Up to 4 topics at once; each fetches page N+1 while N downloads."""
+        sem = asyncio.Semaphore(4)
+        async def topic(t):
+            async with sem:
+                page = 1; nxt = asyncio.ensure_future(self.u_topic_photos(t["slug"], page))
+                while not prog.full:
+                    try: photos = await nxt
+                    except Exception: return
+                    if not photos: return
+                    page += 1; nxt = asyncio.ensure_future(self.u_topic_photos(t["slug"], page))
+                    await self.download_photos(rank_photos(self.res, photos, prog.cap is not None), self.db.view_dir(wdir, os.path.join("unsplash", "topics", t["slug"])), prog, job)
+                nxt.cancel()
+        await asyncio.gather(*(topic(t) for t in topics))
+
+    # ── GitHub ────────────────────────────────────────────────────────────────
+    async def resolve_branch(self, owner, repo, hint):
+        cands = list(dict.fromkeys(b for b in (hint, "main", "master") if b))
+        oks = await asyncio.gather(*(self.http.run(self.http.head_ok, f"https://github.com/{owner}/{repo}/archive/{b}.zip")
+                                     for b in cands))
+        return next((b for b, ok in zip(cands, oks) if ok), "")
+
+    async def list_repo_images(self, owner, repo, branch, subdir, strict):
+        """(path, size, score) of the images, from the tree API; strict keeps
+        only those eligible for the screen. None when truncated or unavailable."""
+        try: tree = await self.http.run(self.http.get_json,
+                                        f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1")
+        except Exception: return None
+        if tree.get("truncated"): return None
+        pfx = (subdir.lower() + "/") if subdir else ""
+        imgs = ((e["path"], e.get("size") or 0) for e in tree.get("tree", [])
+                if e.get("type") == "blob" and _is_image(e["path"]) and e["path"].lower().startswith(pfx))
+        return [(p, n, sc) for p, n in imgs for sc, ok in (fit_blob(self.res, p, n),) if ok or not strict]
+
+    async def download_raw(self, owner, repo, branch, paths, wdir, prog, job, sem=None):
+        sem = sem or asyncio.Semaphore(self.workers)
+        async def one(p):
+            async with sem:
+                if prog.full: return
+                url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{p}"
+                prog.tally(await self.http.run(self._fetch_file, url, wdir, os.path.basename(p), job))
+        await asyncio.gather(*(one(p) for p in paths))
+
+    def _zip_sync(self, spec, branch, wdir, tally, job):
+        """Zip fallback: archive to a temp file, then extract images, skipping
+        entries already known by CRC-32 + size without inflating them."""
+        slug, owner, repo, _hint, subdir = spec
+        url = f"https://github.com/{owner}/{repo}/archive/{branch}.zip"
+        try: tmp, *_ = self.http.fetch_to(url, tempfile.gettempdir(), job, attempts=4)
+        except Exception: tally("err"); return
+        pfx = f"{repo}-{branch}/".lower() + (subdir.lower() + "/" if subdir else "")
+        try:
+            with zipfile.ZipFile(tmp) as zf:
+                for zi in zf.infolist():
+                    if zi.is_dir() or not _is_image(zi.filename) or not zi.filename.lower().startswith(pfx): continue
+                    if self.db.has_crc(zi.CRC, zi.file_size): tally("dupe"); continue
+                    part = None
+                    try:   # one bad entry costs only itself
+                        fd, part = tempfile.mkstemp(prefix=".wallpimp-", suffix=".part", dir=wdir)
+                        h = hashlib.md5()
+                        with os.fdopen(fd, "wb") as f, zf.open(zi) as src:
+                            for chunk in iter(lambda: src.read(_CHUNK), b""): f.write(chunk); h.update(chunk)
+                        res = self._commit((part, h.hexdigest(), zi.CRC, zi.file_size), wdir,
+                                           os.path.basename(zi.filename), None)
+                        part = None   # _commit renamed or removed it
+                    except (OSError, zipfile.BadZipFile, zlib.error, EOFError): res = "err"
+                    finally:
+                        if part:
+                            try: os.unlink(part)
+                            except OSError: pass
+                    tally(res)
+        except (OSError, zipfile.BadZipFile): tally("err")
+        finally: os.unlink(tmp)
+
+    async def download_repos(self, wdir, prog, job):
+        """Resolve + list + download, pipelined per repo; 16 repos at a time.
+        With a cap, every tree is listed first and the best-ranked images
+        across all repos are fetched first (downloadRanked)."""
+        os.makedirs(wdir, exist_ok=True)
+        sem = asyncio.Semaphore(16); loop = asyncio.get_running_loop()
+        async def zip_fallback(spec, branch, d):
+            await self.http.run(self._zip_sync, spec, branch, d, lambda r: loop.call_soon_threadsafe(prog.tally, r), job)
+        async def resolve(spec):
+            branch = await self.resolve_branch(spec[1], spec[2], spec[3])
+            return branch, branch and await self.list_repo_images(spec[1], spec[2], branch, spec[4], prog.cap is not None)
+        async def repo(spec):
+            slug, owner, name, _hint, _subdir = spec
+            branch, imgs = await resolve(spec)
+            if not branch: return
+            async with sem:
+                if prog.full: return
+                d = self.db.view_dir(wdir, slug); os.makedirs(d, exist_ok=True)
+                if imgs is not None: await self.download_raw(owner, name, branch, [i[0] for i in imgs], d, prog, job)
+                else: await zip_fallback(spec, branch, d)
+        if prog.cap is None:
+            await asyncio.gather(*(repo(s) for s in wp._BUILTIN_REPOS)); return
+        listed = [(s, b, imgs) for s, (b, imgs) in zip(wp._BUILTIN_REPOS, await asyncio.gather(
+            *(resolve(s) for s in wp._BUILTIN_REPOS))) if b]
+        ranked = rank_images([(i[0], i[1], i[2], n) for n, (_s, _b, imgs) in enumerate(listed) for i in imgs or ()])
+        pool = asyncio.Semaphore(self.workers)
+        async def one(path, n):
+            spec, branch, _ = listed[n]; d = self.db.view_dir(wdir, spec[0]); os.makedirs(d, exist_ok=True)
+            await self.download_raw(spec[1], spec[2], branch, [path], d, prog, job, pool)
+        await asyncio.gather(*(one(i[0], i[3]) for i in ranked))
+        for spec, branch, imgs in listed:   # unrankable zip fallbacks, only while the cap remains
+            if imgs is None and not prog.full:
+                d = self.db.view_dir(wdir, spec[0]); os.makedirs(d, exist_ok=True)
+                await zip_fallback(spec, branch, d)
+
+    async def count_repos(self):
+        sem = asyncio.Semaphore(8)
+        async def one(spec):
+            _slug, owner, name, hint, subdir = spec
+            branch = await self.resolve_branch(owner, name, hint)
+            if not branch: return 0
+            async with sem: return len(await self.list_repo_images(owner, name, branch, subdir, True) or [])
+        return sum(await asyncio.gather(*(one(s) for s in wp._BUILTIN_REPOS)))
+
+    # ── commands ──────────────────────────────────────────────────────────────
+    async def run(self, cmd, emit, job):
+        c = cmd.get("cmd", "").lower(); workers = cmd.get("workers") or self.workers
+        try:
+            if c == "scan":
+                async def unsplash_total():
+                    try: return sum(t["total_photos"] for t in await self.u_topics())
+                    except Exception: return 1500
+                a, b = await asyncio.gather(self.count_repos(), unsplash_total())
+                emit({"event": "scan_result", "total": a + b})
+            elif c == "download":
+                prog = Progress(emit, cmd.get("target") or None); wdir = cmd.get("wdir", "")
+                emit({"event": "progress", "msg": "resolving"})
+                await self.download_repos(wdir, prog, job)
+                if not prog.full:
+                    try: await self.download_topics(await self.u_topics(), wdir, prog, job)
+                    except Exception: pass
+                misses = 0   # rounds with nothing new (all dupes or unsuitable)
+                while prog.cap is not None and prog.cap > 0 and misses < 3:
+                    before = prog.new
+                    try: photos = await self.u_random(min(prog.cap, 30))
+                    except Exception: break
+                    if not photos: break
+                    await self.download_photos(rank_photos(self.res, photos, True),
+                                               self.db.view_dir(wdir, os.path.join("unsplash", "random")), prog, job)
+                    if prog.new == before: misses += 1
+                await self._save_db(); prog.done(elapsed=time.monotonic() - prog.start)
+            elif c == "topics":
+                emit({"event": "topics", "topics": await self.u_topics()})
+            elif c == "collections":
+                emit({"event": "collections", "cols": await self.u_collections(cmd.get("page", 1))})
+            elif c in ("topic_photos", "search", "col_photos", "random"):
+                photos = await (self.u_topic_photos(cmd.get("slug", ""), cmd.get("page", 1)) if c == "topic_photos" else
+                                self.u_search(cmd.get("query", ""), cmd.get("page", 1)) if c == "search" else
+                                self.u_col_photos(cmd.get("col_id", ""), cmd.get("page", 1)) if c == "col_photos" else
+                                self.u_random(cmd.get("count") or 15))
+                prog = Progress(emit)
+                await self.download_photos(photos, cmd.get("dest", ""), prog, job, workers)
+                await self._save_db(); prog.done()
+            elif c == "stream":
+                ok, wait = self._budget(_STREAM_RESERVE)
+                if not ok: emit({"event": "done", "wait": int(wait) + 1}); return
+                n = cmd.get("count") or 5; off = cmd.get("offset") or 0   # cursor into the results
+                photos = ((await self.u_search(cmd["query"], off // _PAGE_SZ + 1))[off % _PAGE_SZ:] if cmd.get("query")
+                          else await self.u_random(n))[:n]
+                prog = Progress(emit)
+                await self.download_photos(photos, cmd.get("dest", ""), prog, job)
+                await self._save_db(); prog.done(total=len(photos))
+            elif c == "forget":
+                n = self.db.forget(cmd.get("paths") or []); await self._save_db()
+                emit({"event": "done", "total": n})
+            elif c == "batch":
+                if not cmd.get("manifest"): emit({"event": "error", "msg": "empty manifest"}); return
+                await self.batch(cmd["manifest"], cmd.get("dest", ""), workers, emit, job)
+            else:
+                emit({"event": "error", "msg": "unknown command: " + cmd.get("cmd", "")})
+        except Exception as e:
+            emit({"event": "error", "msg": str(e) or type(e).__name__})
+
+    async def batch(self, manifest, dest, workers, emit, job):
+        """RunBatch: 4 entries fetch pages at a time, one page ahead of their
+        downloads; every entry shares one pool of workers downloads."""
+        start = time.monotonic(); total = Progress(lambda ev: None)
+        entry_sem = asyncio.Semaphore(4); pool = asyncio.Semaphore(workers)
+        fetch = {"search": lambda e, p: self.u_search(e.get("query", ""), p),
+                 "topic": lambda e, p: self.u_topic_photos(e.get("slug", ""), p),
+                 "collection": lambda e, p: self.u_col_photos(e.get("col_id", ""), p)}
+        async def entry(idx, e):
+            kind = str(e.get("kind", "")).lower()
+            label = {"search": f"search '{e.get('query', '')}'", "topic": f"topic {e.get('slug', '')}",
+                     "collection": f"collection {e.get('col_id', '')}"}.get(kind, kind)
+            st = Progress(lambda ev: None, e.get("max") or None); d = e.get("dest") or dest
+            def report(msg=""):
+                el = time.monotonic() - start
+                emit({"event": "progress", "entry": idx, "label": label, "new": st.new, "dupes": st.dupes,
+                      "errors": st.errors, "speed": total.new / el if el > 0 else 0, "elapsed": el, "msg": msg})
+            def tally(r): st.tally(r, False); total.tally(r, False); report()
+            first = e.get("from") or 1; last = e.get("to") or (first if not e.get("max") else 0)
+            try: os.makedirs(d, exist_ok=True)
+            except OSError: tally("err"); report("entry_done"); return
+            async with entry_sem:
+                report("fetching")
+                if kind not in fetch: tally("err"); report("entry_done"); return
+                async def one(p):
+                    async with pool:
+                        if not st.full:
+                            tally(await self.http.run(self._fetch_file, p["url"], d, f"unsplash_{p['id']}.jpg", job,
+                                                      {"User-Agent": _UA}))
+                page = first; nxt = asyncio.ensure_future(fetch[kind](e, page)); running = []
+                while not st.full:
+                    try: photos = await nxt
+                    except Exception: tally("err"); break
+                    if not photos: break
+                    page += 1
+                    nxt = (asyncio.ensure_future(fetch[kind](e, page)) if not last or page <= last else None)
+                    running.append(asyncio.ensure_future(asyncio.gather(*(one(p) for p in photos))))
+                    if nxt is None: break
+                if nxt is not None and not nxt.done(): nxt.cancel()
+            await asyncio.gather(*running); report("entry_done")
+        await asyncio.gather(*(entry(i + 1, e) for i, e in enumerate(manifest)))
+        await self._save_db()
+        emit({"event": "done", "new": total.new, "dupes": total.dupes, "errors": total.errors,
+              "elapsed": time.monotonic() - start})
+
+    # ── connection ────────────────────────────────────────────────────────────
+    async def handle(self, reader, writer):
+        self.rl_lock = self.rl_lock or asyncio.Lock()
+        tasks = set()
+        def send(ev):
+            # omitempty, as the Go encoder does
+            writer.write((json.dumps({k: v for k, v in ev.items() if v or k == "event"}) + "\n").encode())
+        while True:
+            try: line = await reader.readline()
+            except (ConnectionError, ValueError): break
+            if not line: break
+            try: cmd = json.loads(line)
+            except ValueError as e: send({"event": "error", "msg": f"bad json: {e}"}); continue
+            tag = cmd.get("job", "")
+            emit = lambda ev, tag=tag: send(dict(ev, job=tag))
+            c = str(cmd.get("cmd", "")).lower()
+            if c == "ping": emit({"event": "pong"}); continue
+            if c == "resolution":
+                emit({"event": "resolution", "res_w": self.res[0], "res_h": self.res[1],
+                      "dl_w": self.dl[0], "dl_h": self.dl[1]}); continue
+            if c in ("set_limits", "limits"):
+                if c == "set_limits":
+                    self.bw.set_limits(**{k: cmd.get(k) for k in ("global_kbps", "bulk_kbps", "interactive_kbps")})
+                emit({"event": "limits", "limits": dict(self.bw.limits)}); continue
+            if c == "layout":
+                emit({"event": "layout", "msg": self.db.set_layout(cmd.get("layout", ""), cmd.get("wdir", ""))}); continue
+            if c == "shutdown":   # cancel running jobs rather than wait them out
+                self.bw.cancel_all()
+                for t in tasks: t.cancel()
+                emit({"event": "bye"}); break
+            self.db.refresh()
+            async def job_task(cmd=cmd, emit=emit):
+                job = self.bw.start(str(cmd.get("cmd", "")).lower(), str(cmd.get("prio", "")).lower())
+                try: await self.run(cmd, emit, job)
+                finally: self.bw.done(job)
+            t = asyncio.ensure_future(job_task()); tasks.add(t); t.add_done_callback(tasks.discard)
+        if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+        try: await writer.drain(); writer.close()
+        except ConnectionError: pass
+
+# ── main ──────────────────────────────────────────────────────────────────────
+async def _serve(hash_path, workers):
+    eng = Engine(hash_path, workers); limit = 4 * 1024 * 1024
+    if sys.platform == "win32":
+        srv = await asyncio.start_server(eng.handle, "127.0.0.1", 0, limit=limit)
+        addr = f"tcp:{srv.sockets[0].getsockname()[1]}"
+    else:
+        addr = f"/tmp/wallpimp-{os.getuid()}-py{os.getpid()}.sock"
+        if os.path.exists(addr): os.unlink(addr)
+        srv = await asyncio.start_unix_server(eng.handle, addr, limit=limit)
+    print(addr, flush=True)
+    stop = asyncio.Event()
+    for s in (signal.SIGINT, signal.SIGTERM):
+        try: asyncio.get_running_loop().add_signal_handler(s, stop.set)
+        except (NotImplementedError, RuntimeError): pass
+    try:
+        async with srv: await stop.wait()
+    finally:
+        if not addr.startswith("tcp:") and os.path.exists(addr): os.unlink(addr)
+
+def main():
+    if len(sys.argv) < 3:
+        print("usage: wallpimp_engine.py <hash_db_path> <workers>", file=sys.stderr); sys.exit(1)
+    try: workers = int(sys.argv[2])
+    except ValueError: workers = 16
+    try: asyncio.run(_serve(sys.argv[1], workers))
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()
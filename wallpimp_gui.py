@@ -9,6 +9,8 @@ Features: wallpaper preview grid, stop & resume downloads, gradient UI.
 
 import json, math, os, platform, queue, random, shutil, socket
 import subprocess, sys, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
@@ -29,6 +31,22 @@ except ImportError:
     except Exception:
         HAS_PIL = False
 
+# ── Shared backend ────────────────────────────────────────────────────────────
+# The CLI script (`wallpimp`, no .py suffix) holds the wallpaper setters and
+# render cache; load it as a module so the GUI doesn't keep its own copies.
+def _load_backend():
+    try:
+        from importlib.machinery import SourceFileLoader
+        from importlib.util import module_from_spec, spec_from_loader
+        loader = SourceFileLoader("wallpimp_cli", str(Path(__file__).parent / "wallpimp"))
+        mod = module_from_spec(spec_from_loader("wallpimp_cli", loader))
+        sys.modules["wallpimp_cli"] = mod   # so its process pools can pickle its functions
+        loader.exec_module(mod); return mod
+    except Exception:
+        return None
+
+wp = _load_backend()
+
 
 # ── Font detection ─────────────────────────────────────────────────────────────
 def _best_mono() -> str:
@@ -93,7 +111,9 @@ def find_engine() -> Path | None:
     here = Path(__file__).parent / name
     if here.exists(): return here
     found = shutil.which(name)
-    return Path(found) if found else None
+    if found: return Path(found)
+    py = Path(__file__).parent / "wallpimp_engine.py"   # pure-Python fallback
+    return py if py.exists() else None
 
 
 # ── Engine client ─────────────────────────────────────────────────────────────
@@ -111,13 +131,13 @@ class EngineClient:
     def start(self) -> str | None:
         eng = find_engine()
         if not eng:
-            return ("wallpimp-engine binary not found.\n"
+            return ("wallpimp-engine binary not found (nor wallpimp_engine.py).\n"
                     "Build it:  cd src && go build -o ../wallpimp-engine .\n"
                     "Then place it next to wallpimp_gui.py or on your PATH.")
         self.hash_path.parent.mkdir(parents=True, exist_ok=True)
         try:
             self._proc = subprocess.Popen(
-                [str(eng), str(self.hash_path), str(self.workers)],
+                ([sys.executable] if eng.suffix == ".py" else []) + [str(eng), str(self.hash_path), str(self.workers)],
                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             addr = self._proc.stdout.readline().strip()
             if not addr:
@@ -300,7 +320,7 @@ class PreviewPanel:
 
     def __init__(self, parent, wdir, set_wp_cb=None):
         self.parent=parent; self.wdir=wdir; self.set_wp_cb=set_wp_cb
-        self._thumbs=[]; self._files=[]; self._loading=False; self._pwin=None
+        self._thumbs=[]; self._files=[]; self._shown=[]; self._loading=False; self._viewer=None
 
         self.frame = tk.Frame(parent, bg=BG)
 
@@ -354,7 +374,7 @@ class PreviewPanel:
 
     def _load_bg(self):
         files = sorted(
-            [p for p in Path(self.wdir).rglob("*") if p.suffix.lower() in _IMG_EXTS],
+            [p for p in Path(self.wdir).rglob("*") if p.suffix.lower() in _IMG_EXTS and ".store" not in p.parts],
             key=lambda p: p.stat().st_mtime if p.exists() else 0, reverse=True)[:200]
         self._files = files; thumbs = []
         for i,fp in enumerate(files):
@@ -369,7 +389,7 @@ class PreviewPanel:
 
     def _render(self, thumbs):
         for w in self._grid.winfo_children(): w.destroy()
-        self._thumbs.clear()
+        self._thumbs.clear(); self._shown=[fp for fp,_ in thumbs]
         if not thumbs:
             tk.Label(self._grid, text="No wallpapers found.\nDownload some first!",
                      bg=BG, fg=MUTED, font=(MONO,MONO_SZ), justify="center").grid(
@@ -408,27 +428,109 @@ class PreviewPanel:
 
     def _full(self, path):
         if not HAS_PIL: return
-        if self._pwin and self._pwin.winfo_exists(): self._pwin.destroy()
-        try: img = Image.open(path)
-        except Exception: return
-        win = tk.Toplevel(self.parent); self._pwin = win
-        win.title(f"Preview — {path.name}"); win.configure(bg=BG)
-        win.transient(self.parent)
-        sw,sh = win.winfo_screenwidth(), win.winfo_screenheight()
-        img.thumbnail((int(sw*0.8), int(sh*0.8)), Image.LANCZOS)
-        tk_img = ImageTk.PhotoImage(img)
-        win.geometry(f"{img.width+20}x{img.height+80}")
-        win.update_idletasks()
-        win.geometry(f"+{(sw-win.winfo_width())//2}+{(sh-win.winfo_height())//2}")
-        il = tk.Label(win, image=tk_img, bg=BG); il.image=tk_img; il.pack(padx=10,pady=(10,4))
-        bar = tk.Frame(win, bg=BG); bar.pack(fill="x", padx=10, pady=(4,10))
-        tk.Label(bar, text=path.name, bg=BG, fg=MUTED, font=(MONO,SMALL_SZ)).pack(side="left")
-        if self.set_wp_cb:
-            _btn(bar, "Set as Wallpaper",
-                 lambda: (self.set_wp_cb(str(path)), win.destroy()),
+        files=self._shown or [path]
+        idx=files.index(path) if path in files else 0
+        if self._viewer and self._viewer.alive: self._viewer.goto(idx, files)
+        else: self._viewer=ImageViewer(self.parent, files, idx, self.set_wp_cb)
+
+
+# ── Full-size viewer ─────────────────────────────────────────────────────────
+def _decode_to(path, box):
+    """Decode path straight to at most box (w,h): JPEG via draft, everything
+    else via reduce() before the final LANCZOS pass."""
+    img=Image.open(path)
+    bw,bh=box
+    img.draft("RGB",(bw,bh))
+    if img.mode not in ("RGB","RGBA","L"): img=img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    f=min(img.width//bw, img.height//bh)
+    if f>=2: img=img.reduce(f)
+    img.thumbnail(box, Image.LANCZOS)
+    return img
+
+class ImageViewer:
+    """Preview window with ←/→ navigation. Decoding runs on worker threads;
+    decoded neighbours are prefetched into a small LRU so stepping is instant."""
+    CACHE=8; AHEAD=2
+
+    def __init__(self, parent, files, idx, set_wp_cb=None):
+        self.parent=parent; self.files=list(files); self.idx=idx; self.set_wp_cb=set_wp_cb
+        self._lru=OrderedDict(); self._inflight=set(); self._bad=set(); self._mu=threading.Lock()
+        self._pool=ThreadPoolExecutor(max_workers=2); self._tk_img=None
+        win=tk.Toplevel(parent); self.win=win
+        win.configure(bg=BG); win.transient(parent)
+        sw,sh=win.winfo_screenwidth(), win.winfo_screenheight()
+        self.box=(int(sw*0.8), int(sh*0.8))
+        win.geometry(f"{self.box[0]+20}x{self.box[1]+80}+{(sw-self.box[0]-20)//2}+{(sh-self.box[1]-80)//2}")
+        self._il=tk.Label(win, bg=BG, fg=MUTED, font=(MONO,SMALL_SZ))
+        self._il.pack(fill="both", expand=True, padx=10, pady=(10,4))
+        bar=tk.Frame(win, bg=BG); bar.pack(fill="x", padx=10, pady=(4,10))
+        self._name=tk.StringVar()
+        tk.Label(bar, textvariable=self._name, bg=BG, fg=MUTED, font=(MONO,SMALL_SZ)).pack(side="left")
+        if set_wp_cb:
+            _btn(bar, "Set as Wallpaper", lambda: (set_wp_cb(str(self.files[self.idx])), self.close()),
                  accent=True, small=True).pack(side="right")
-        _btn(bar, "Close", win.destroy, small=True).pack(side="right", padx=(0,8))
-        win.bind("<Escape>", lambda _: win.destroy())
+        _btn(bar, "Close", self.close, small=True).pack(side="right", padx=(0,8))
+        _btn(bar, "→", lambda: self.step(1), small=True).pack(side="right", padx=(0,8))
+        _btn(bar, "←", lambda: self.step(-1), small=True).pack(side="right", padx=(0,4))
+        win.bind("<Escape>", lambda _: self.close())
+        win.bind("<Left>",   lambda _: self.step(-1))
+        win.bind("<Right>",  lambda _: self.step(1))
+        win.protocol("WM_DELETE_WINDOW", self.close)
+        self._show()
+
+    @property
+    def alive(self): return self.win is not None and self.win.winfo_exists()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.alive: self.win.destroy()
+        self.win=None
+
+    def goto(self, idx, files=None):
+        if files is not None: self.files=list(files)
+        self.idx=idx; self.win.lift(); self._show()
+
+    def step(self, d):
+        if not self.files: return
+        self.idx=(self.idx+d)%len(self.files); self._show()
+
+    def _show(self):
+        path=self.files[self.idx]
+        self.win.title(f"Preview — {path.name}  ({self.idx+1}/{len(self.files)})")
+        self._name.set(path.name)
+        with self._mu:
+            img=self._lru.get(path)
+            if img is not None: self._lru.move_to_end(path)
+        if path in self._bad:
+            self._il.config(image="", text="Cannot decode this image.")
+        elif img is None:
+            self._il.config(image="", text="Loading..."); self._request(path)
+        else:
+            self._tk_img=ImageTk.PhotoImage(img); self._il.config(image=self._tk_img, text="")
+        n=len(self.files)
+        for d in range(1, self.AHEAD+1):
+            self._request(self.files[(self.idx+d)%n]); self._request(self.files[(self.idx-d)%n])
+
+    def _request(self, path):
+        with self._mu:
+            if path in self._lru or path in self._inflight or path in self._bad: return
+            self._inflight.add(path)
+        try: self._pool.submit(self._decode, path)
+        except RuntimeError: pass  # pool shut down
+
+    def _decode(self, path):
+        try: img=_decode_to(path, self.box)
+        except Exception: img=None
+        with self._mu:
+            self._inflight.discard(path)
+            if img is None: self._bad.add(path)
+            else:
+                self._lru[path]=img
+                while len(self._lru)>self.CACHE: self._lru.popitem(last=False)
+        if self.win is not None: self.parent.after(0, self._ready, path)
+
+    def _ready(self, path):
+        if self.alive and self.files[self.idx]==path: self._show()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -449,8 +551,11 @@ class WallPimpGUI:
         self._cfg_dir = config_dir()
         self._cfg_file = self._cfg_dir / "config.json"
         self._cfg = self._load_cfg()
+        self._render = wp.RenderCache(self._cfg) if wp else None
+        self._prof = self._start_profiler()
         self._setup_styles(); self._build_ui()
         self._start_engine(); self._poll()
+        if self._prof: self._lag_tick(); self._prof_refresh()
 
     def _load_cfg(self):
         d={"wallpaper_dir":str(default_wallpaper_dir()),"slideshow_interval":300,"download_workers":16}
@@ -477,7 +582,7 @@ class WallPimpGUI:
         err=self.engine.start()
         if err: messagebox.showerror("Engine Error",err); return
         self._rthread=threading.Thread(target=self._reader,daemon=True); self._rthread.start()
-        self.engine.send({"cmd":"ping"})
+        self.engine.send({"cmd":"ping"}); self._send_limits(); self._send_layout()
 
     def _restart_engine(self):
         if self.engine: self.engine.kill()
@@ -489,7 +594,15 @@ class WallPimpGUI:
             try: self._q.get_nowait()
             except queue.Empty: break
         self._rthread=threading.Thread(target=self._reader,daemon=True); self._rthread.start()
-        self.engine.send({"cmd":"ping"}); return None
+        self.engine.send({"cmd":"ping"}); self._send_limits(); self._send_layout(); return None
+
+    def _send_limits(self):
+        if self.engine: self.engine.send({"cmd":"set_limits","global_kbps":int(self._cfg.get("bw_global_kbps",0)),
+                                          "bulk_kbps":int(self._cfg.get("bw_bulk_kbps",0)),
+                                          "interactive_kbps":int(self._cfg.get("bw_interactive_kbps",0))})
+
+    def _send_layout(self):
+        if self.engine: self.engine.send({"cmd":"layout","layout":self._cfg.get("layout","flat"),"wdir":self._cfg["wallpaper_dir"]})
 
     def _reader(self):
         while True:
@@ -500,12 +613,49 @@ class WallPimpGUI:
 
     def _poll(self):
         try:
-            while True: self._handle(self._q.get_nowait())
+            while True:
+                ev=self._q.get_nowait()
+                if not self._prof: self._handle(ev); continue
+                with self._prof.timed("handle:"+ev.get("event","?")): self._handle(ev)
         except queue.Empty: pass
         self.root.after(40, self._poll)
 
+    # ── Profiling ─────────────────────────────────────────────────────────────
+    # Opt-in (WALLPIMP_PROFILE=1 or Settings). The Tk thread is profiled, the
+    # usual stutter suspects are timed as sections, and a 50 ms ticker measures
+    # how late root.after callbacks fire — the loop latency the user feels.
+    def _start_profiler(self):
+        if not wp: return None
+        prof=wp.Profiler("gui",self._cfg)
+        if not prof.enabled: return None
+        prof.start()
+        prof.wrap(globals(),"log_append")
+        prof.wrap(GradientBar,"_draw",prefix="GradientBar.")
+        prof.wrap(PreviewPanel,"_render","_load_bg",prefix="PreviewPanel.")
+        prof.wrap(ImageViewer,"_show","_ready",prefix="ImageViewer.")
+        return prof
+
+    def _lag_tick(self, due=None):
+        now=time.perf_counter()
+        if due is not None: self._prof.lag((now-due)*1000)
+        self.root.after(50, self._lag_tick, time.perf_counter()+0.05)
+
+    def _prof_refresh(self):
+        self._prof_var.set(self._prof.summary()); self.root.after(2000, self._prof_refresh)
+
+    def _prof_toggle(self):
+        self._cfg["profile"]=not self._cfg.get("profile"); self._save_cfg()
+        self._prof_btn.config(text="Disable Profiling" if self._cfg["profile"] else "Enable Profiling")
+        self._status("Profiling "+("enabled" if self._cfg["profile"] else "disabled")+" from next launch",MUTED)
+
+    def _prof_snapshot(self):
+        p=self._prof.snapshot() if self._prof else None
+        if p: self._status(f"Profile written: {p}",SUCCESS); log_append(self._log,f"Profile: {p}",SUCCESS)
+
     def _handle(self, ev):
         k=ev.get("event","")
+        # Interactive jobs ("ui") run alongside a bulk download; keep them off its progress bar.
+        if ev.get("job")=="ui" and self._busy and k in ("progress","done"): self._on_ui_job(ev); return
         if   k=="pong":        self._on_pong()
         elif k=="scan_result": self._on_scan(ev.get("total",0))
         elif k=="progress":    self._on_progress(ev)
@@ -741,7 +891,7 @@ class WallPimpGUI:
         self._status("Downloading...",WARN); self._set_dl_btns("downloading")
         lab=f"target: {target}" if target else "full library"
         log_append(self._log,f"Starting download ({lab})...",WARN)
-        cmd={"cmd":"download","wdir":self._cfg["wallpaper_dir"],"workers":int(self._cfg["download_workers"])}
+        cmd={"cmd":"download","job":"dl","wdir":self._cfg["wallpaper_dir"],"workers":int(self._cfg["download_workers"])}
         if target>0: cmd["target"]=target
         self._dl_last_cmd=cmd; self.engine.send(cmd)
 
@@ -780,6 +930,12 @@ class WallPimpGUI:
                 self._eta_var.set(f"ETA {eta:.0f}s" if eta<60 else f"ETA {eta/60:.0f}m" if eta<3600 else f"ETA {eta/3600:.1f}h")
         if msg: log_append(self._log,msg,MUTED)
 
+    def _on_ui_job(self, ev):
+        nw=ev.get("new",0); dp=ev.get("dupes",0)
+        if ev.get("event")=="progress": self._status(f"Unsplash: {nw:,} new  ·  {dp:,} dupes",WARN); return
+        self._status(f"Unsplash done — {nw:,} new",SUCCESS)
+        log_append(self._log,f"Unsplash done: {nw:,} new, {dp:,} dupes",SUCCESS)
+
     def _on_done(self, ev):
         if self._stopped: return
         self._busy=False; nw=ev.get("new",0); dp=ev.get("dupes",0); er=ev.get("errors",0); el=ev.get("elapsed",0.0)
@@ -788,6 +944,17 @@ class WallPimpGUI:
         self._speed_var.set(""); self._eta_var.set(f"{el:.0f}s" if el else "")
         self._status(f"Done — {nw:,} new wallpapers saved",SUCCESS); self._set_dl_btns("idle")
         log_append(self._log,f"Done: {nw:,} new, {dp:,} dupes, {er:,} errors"+(f"  ({el:.0f}s)" if el else ""),SUCCESS)
+        if nw and wp and self._cfg.get("transcode"): self._transcode()
+
+    def _transcode(self):
+        log_append(self._log,"Transcoding new downloads...",MUTED)
+        def work():
+            try:
+                st=wp.transcode_library(self._cfg)
+                msg,col=f"Transcoded {st['done']:,} files, reclaimed {wp._fmt_bytes(st['reclaimed'])}",SUCCESS
+            except Exception as ex: msg,col=f"Transcode failed: {ex}",ERR
+            self.root.after(0,log_append,self._log,msg,col)
+        threading.Thread(target=work,daemon=True).start()
 
     # ── Preview ───────────────────────────────────────────────────────────────
     def _build_preview(self):
@@ -799,18 +966,15 @@ class WallPimpGUI:
     def _set_wp(self, path):
         self._status(f"Setting: {Path(path).name}",WARN)
         log_append(self._log,f"Set wallpaper: {Path(path).name}",SUCCESS)
-        try:
-            if OS=="Linux":
-                uri=f"file://{path}"
-                subprocess.run(["gsettings","set","org.gnome.desktop.background","picture-uri",uri],capture_output=True)
-                subprocess.run(["gsettings","set","org.gnome.desktop.background","picture-uri-dark",uri],capture_output=True)
-            elif OS=="Darwin":
-                subprocess.run(["osascript","-e",f'tell application "System Events" to tell every desktop to set picture to "{path}"'],capture_output=True)
-            elif OS=="Windows":
-                import ctypes; ctypes.windll.user32.SystemParametersInfoW(20,0,path,3)
-            self._status(f"Wallpaper set: {Path(path).name}",SUCCESS)
-        except Exception as ex:
-            self._status(f"Could not set wallpaper: {ex}",ERR)
+        if not wp: self._status("Could not set wallpaper: wallpimp backend unavailable",ERR); return
+        def work():
+            try:
+                ok=wp.set_wallpaper(str(path),self._render.get(path))
+                msg,col=(f"Wallpaper set: {Path(path).name}",SUCCESS) if ok else \
+                        (f"Could not set wallpaper on {OS} ({wp.detect_de()})",ERR)
+            except Exception as ex: msg,col=f"Could not set wallpaper: {ex}",ERR
+            self.root.after(0,self._status,msg,col)
+        threading.Thread(target=work,daemon=True).start()
 
     # ── Unsplash ──────────────────────────────────────────────────────────────
     def _build_unsplash(self):
@@ -839,7 +1003,7 @@ class WallPimpGUI:
     def _do_search(self):
         q=self._sq.get().strip()
         if not q: messagebox.showwarning("Search","Enter a keyword first."); return
-        self.engine.send({"cmd":"search","query":q,"page":self._spg.get(),
+        self.engine.send({"cmd":"search","job":"ui","query":q,"page":self._spg.get(),
                           "dest":str(Path(self._sdir.get())/q),"workers":int(self._cfg["download_workers"])})
         self._status(f"Searching: {q}...",WARN)
         log_append(self._log,f"Unsplash search: '{q}' page {self._spg.get()}",WARN)
@@ -870,7 +1034,7 @@ class WallPimpGUI:
         sel=self._tlb.curselection()
         if not sel: messagebox.showinfo("Topics","Select a topic first."); return
         slug=self._topic_slugs[sel[0]]; dest=str(Path(self._tdir.get())/slug)
-        self.engine.send({"cmd":"topic_photos","slug":slug,"page":1,"dest":dest,
+        self.engine.send({"cmd":"topic_photos","job":"ui","slug":slug,"page":1,"dest":dest,
                           "workers":int(self._cfg["download_workers"])})
         self._status(f"Downloading topic: {slug}...",WARN)
         log_append(self._log,f"Downloading Unsplash topic: {slug}",WARN)
@@ -889,7 +1053,7 @@ class WallPimpGUI:
         _btn(cd,"Download Random",self._dl_rand,accent=True).pack(anchor="w")
 
     def _dl_rand(self):
-        self.engine.send({"cmd":"random","count":self._rcnt.get(),"dest":self._rdir.get(),
+        self.engine.send({"cmd":"random","job":"ui","count":self._rcnt.get(),"dest":self._rdir.get(),
                           "workers":int(self._cfg["download_workers"])})
         self._status("Downloading randoms...",WARN)
         log_append(self._log,f"Downloading {self._rcnt.get()} random wallpapers...",WARN)
@@ -907,6 +1071,21 @@ class WallPimpGUI:
         tk.Label(cd,text="Time between changes (seconds)",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,8))
         self._intvar=tk.IntVar(value=int(self._cfg.get("slideshow_interval",300)))
         _spinbox(cd,self._intvar,10,86400,8).pack(anchor="w",ipady=5)
+        tk.Label(cd,text="Filter",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w",pady=(16,0))
+        tk.Label(cd,text="dark · light · auto · colour:blue · colour:#rrggbb  (blank = all)",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,8))
+        self._ssfilt=tk.StringVar(value=self._cfg.get("slideshow_filter",""))
+        _entry(cd,self._ssfilt,24).pack(anchor="w",ipady=5)
+        tk.Label(cd,text="Source",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w",pady=(16,0))
+        tk.Label(cd,text="library · stream (queue of new Unsplash photos; least recently shown evicted past the quota)",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,8))
+        sr=tk.Frame(cd,bg=CARD); sr.pack(anchor="w")
+        self._sssrc=tk.StringVar(value=self._cfg.get("slideshow_source","library"))
+        self._ssq=tk.StringVar(value=self._cfg.get("stream_query",""))
+        self._ssquota=tk.IntVar(value=int(self._cfg.get("stream_quota_mb",1024)))
+        _entry(sr,self._sssrc,10).pack(side="left",ipady=5)
+        tk.Label(sr,text="Query",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(side="left",padx=(12,4))
+        _entry(sr,self._ssq,16).pack(side="left",ipady=5)
+        tk.Label(sr,text="Quota MB",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(side="left",padx=(12,4))
+        _spinbox(sr,self._ssquota,64,1<<20,7).pack(side="left",ipady=5)
         _sep(cd,bg=BORDER).pack(fill="x",pady=(18,18))
         tk.Label(cd,text="Service Control",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w",pady=(0,10))
         br=tk.Frame(cd,bg=CARD); br.pack(anchor="w")
@@ -923,7 +1102,13 @@ class WallPimpGUI:
         ht=tk.Frame(cd,bg=CARD); ht.pack(fill="x",pady=(18,0))
         tk.Label(ht,text="CLI:  wallpimp --daemon",bg=CARD,fg=DIM,font=(MONO,SMALL_SZ)).pack(side="left")
 
-    def _ss_savi(self): self._cfg["slideshow_interval"]=self._intvar.get(); self._save_cfg()
+    def _ss_savi(self):
+        self._cfg["slideshow_interval"]=self._intvar.get()
+        self._cfg["slideshow_filter"]=self._ssfilt.get().strip().lower()
+        src=self._sssrc.get().strip().lower()
+        self._cfg["slideshow_source"]=src if src in ("library","stream") else "library"
+        self._cfg["stream_query"]=self._ssq.get().strip(); self._cfg["stream_quota_mb"]=self._ssquota.get()
+        self._save_cfg()
     def _ss_env(self): messagebox.showinfo("Session Env","Run from a graphical terminal:\n\nwallpimp → Slideshow → Save session env\n\nCaptures D-Bus vars for systemd.")
     def _ss_start_lin(self):
         self._ss_savi()
@@ -964,8 +1149,34 @@ class WallPimpGUI:
         tk.Label(cd,text="Seconds between changes",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,6))
         self._si=tk.IntVar(value=int(self._cfg.get("slideshow_interval",300)))
         _spinbox(cd,self._si,10,86400,8).pack(anchor="w",ipady=5)
+        tk.Frame(cd,bg=CARD,height=16).pack()
+        tk.Label(cd,text="Bandwidth Limits",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w")
+        tk.Label(cd,text="KiB/s, 0 = unlimited — applied live; searches and randoms preempt bulk syncs",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,6))
+        bwr=tk.Frame(cd,bg=CARD); bwr.pack(anchor="w"); self._bwv={}
+        for k,lbl in (("bw_global_kbps","Global"),("bw_bulk_kbps","Bulk job"),("bw_interactive_kbps","Interactive job")):
+            tk.Label(bwr,text=lbl,bg=CARD,fg=MUTED,font=(MONO,SMALL_SZ)).pack(side="left",padx=(0,6))
+            self._bwv[k]=tk.IntVar(value=int(self._cfg.get(k,0))); _spinbox(bwr,self._bwv[k],0,1_000_000,8).pack(side="left",ipady=4,padx=(0,16))
+        tk.Frame(cd,bg=CARD,height=16).pack()
+        tk.Label(cd,text="Library Layout",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w")
+        tk.Label(cd,text="flat · store (each file once under .store/ab/cd/, browsed via per-source folders of links; relative hash DB)",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,6))
+        self._slayout=tk.StringVar(value=self._cfg.get("layout","flat"))
+        _entry(cd,self._slayout,10).pack(anchor="w",ipady=5)
         tk.Frame(cd,bg=CARD,height=20).pack()
         _btn(cd,"Save Settings",self._save_settings,accent=True).pack(anchor="w")
+        im=self._card(inner,py=18); im.pack(fill="x",pady=(14,0))
+        tk.Label(im,text="Import Existing Collection",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w")
+        tk.Label(im,text="Hash a local folder into the database so downloads skip images you already have",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,8))
+        self._imp_btn=_btn(im,"Import Folder…",self._s_import,small=True); self._imp_btn.pack(anchor="w")
+        pf=self._card(inner,py=18); pf.pack(fill="x",pady=(14,0))
+        tk.Label(pf,text="Profiling",bg=CARD,fg=TEXT2,font=(UI_FONT,UI_SZ,"bold")).pack(anchor="w")
+        tk.Label(pf,text="cProfile, memory and per-event timings plus UI loop latency, written to "
+                 f"{config_dir()/'profile'} (also WALLPIMP_PROFILE=1)",bg=CARD,fg=MUTED,font=(UI_FONT,SMALL_SZ)).pack(anchor="w",pady=(2,8))
+        self._prof_var=tk.StringVar(value="active — collecting …" if self._prof else "off")
+        tk.Label(pf,textvariable=self._prof_var,bg=CARD,fg=TEXT,font=(MONO,TINY_SZ),justify="left",wraplength=900).pack(anchor="w",pady=(0,8))
+        pr=tk.Frame(pf,bg=CARD); pr.pack(anchor="w")
+        self._prof_btn=_btn(pr,"Disable Profiling" if self._cfg.get("profile") else "Enable Profiling",self._prof_toggle,small=True)
+        self._prof_btn.pack(side="left",padx=(0,8))
+        if self._prof: _btn(pr,"Write Snapshot",self._prof_snapshot,small=True).pack(side="left")
         inf=tk.Frame(inner,bg=CARD,padx=16,pady=14,highlightthickness=1,highlightbackground=BORDER)
         inf.pack(fill="x",pady=(14,0))
         pil_s="Pillow ✓" if HAS_PIL else "Pillow ✗ (no preview)"
@@ -982,17 +1193,46 @@ class WallPimpGUI:
         d=filedialog.askdirectory(initialdir=self._cfg["wallpaper_dir"])
         if d: self._sdir2.set(d)
 
+    def _s_import(self):
+        if not wp: messagebox.showerror("Import","wallpimp backend unavailable"); return
+        d=filedialog.askdirectory(initialdir=str(Path.home()))
+        if not d: return
+        self._imp_btn.config(state="disabled"); self._status(f"Importing {d}...",WARN)
+        def prog(done,total,rate): self.root.after(0,self._status,f"Importing {done:,}/{total:,}  ({rate:,.0f} files/s)",WARN)
+        def work():
+            try: st=wp.import_library(d,on_progress=prog); msg,col=f"Imported: {wp._import_summary(st)}",SUCCESS
+            except Exception as ex: msg,col=f"Import failed: {ex}",ERR
+            def fin(): self._imp_btn.config(state="normal"); self._status(msg,col); log_append(self._log,msg,col)
+            self.root.after(0,fin)
+        threading.Thread(target=work,daemon=True).start()
+
+    def _relayout(self, move):
+        """Rewrite the hash DB for the new layout, optionally moving files."""
+        self._status("Updating library layout...",WARN)
+        def work():
+            try:
+                n=wp.store_library(self._cfg) if move else 0
+                wp.save_hashes(wp.load_hashes()); msg,col=f"Layout: {self._cfg['layout']}"+(f" — {n:,} files moved" if move else ""),SUCCESS
+            except Exception as ex: msg,col=f"Layout change failed: {ex}",ERR
+            self.root.after(0,lambda: (self._status(msg,col),log_append(self._log,msg,col)))
+        threading.Thread(target=work,daemon=True).start()
+
     def _save_settings(self):
         self._cfg["wallpaper_dir"]=self._sdir2.get()
         self._cfg["download_workers"]=self._sw.get()
         self._cfg["slideshow_interval"]=self._si.get()
-        self._save_cfg(); self._dl_dir_var.set(self._cfg["wallpaper_dir"])
+        for k,v in self._bwv.items(): self._cfg[k]=v.get()
+        lay=self._slayout.get().strip().lower(); lay=lay if lay in ("flat","store") else "flat"
+        relayout=lay!=self._cfg.get("layout","flat"); self._cfg["layout"]=lay; self._slayout.set(lay)
+        self._save_cfg(); self._send_limits(); self._send_layout(); self._dl_dir_var.set(self._cfg["wallpaper_dir"])
+        if relayout and wp: self._relayout(lay=="store" and messagebox.askyesno("Library Layout","Move existing downloads into the store?\nLinks are left at their old paths."))
         self._home_dir_lbl.config(text=f"  {self._cfg['wallpaper_dir']}")
         self._preview.set_dir(self._cfg["wallpaper_dir"])
         self._status("Settings saved",SUCCESS); messagebox.showinfo("Settings","Settings saved.")
 
     def on_close(self):
         if self.engine: self.engine.stop()
+        if self._prof: self._prof.stop()
         self.root.destroy()
 
 